@@ -1,102 +1,1647 @@
 import os
+import sys
+import argparse
 import psycopg2
+import psycopg2.pool
 import pandas as pd
+import numpy as np
 from dotenv import load_dotenv
+from importlib.metadata import version as package_version
+from textblob.en import sentiment as pattern_sentiment
 from textblob.en.sentiments import PatternAnalyzer
 import re
+import sqlite3
+import hashlib
+import time
+import select
+import functools
+import itertools
+import pickle
+import tempfile
+import threading
+import contextlib
+import traceback
+import tracemalloc
+import cProfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from collections import Counter
 import nltk
 import datetime
 import json as pyjson
+import zlib
+import base64
+import http.server
+import urllib.parse
+from decimal import Decimal, ROUND_HALF_UP
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # =====================
 # 1. DATA PREPARATION
 # =====================
 
-def get_data():
+REVIEWS_TABLE = 'zalando_reviews'
+# Plain or schema-qualified identifier; table names are formatted into SQL, so nothing else is accepted
+TABLE_NAME_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?')
+SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), '.cache', f'{REVIEWS_TABLE}.parquet')
+SNAPSHOT_COLUMNS = ['score', 'translated_content', 'review_date', 'platform', 'row_key', 'sentiment_raw', 'sentiment_engine']
+# Re-fetch this many days below the high-water mark so late inserts and edits are picked up
+SNAPSHOT_LOOKBACK_DAYS = 3
+# Rows per server-side cursor round trip in streaming mode
+STREAM_CHUNK_SIZE = 10000
+REVIEW_COLUMNS = ['score', 'translated_content', 'review_date', 'platform']
+# Where --sentiment-cache keeps polarities between runs, beside the incremental snapshots
+SENTIMENT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '.cache', 'sentiment.sqlite')
+SENTIMENT_CACHE_MAX_ENTRIES = 2_000_000
+# Reviews per task handed to a scoring worker
+SCORING_BATCH_SIZE = 2000
+# Part of every cache key together with the TextBlob version (see engine_version), so upgrading
+# TextBlob invalidates stored polarities; bump LexiconScorer's number when its rules change
+ENGINE_VERSIONS = {'pattern': 'PatternAnalyzer', 'lexicon': 'LexiconScorer-1'}
+# Reviews tokenized and scored per NumPy pass by the lexicon engine
+LEXICON_BATCH_SIZE = 100_000
+SENTIMENT_ENGINES = ('pattern', 'lexicon')
+# Words listed per top-word table, on the page and by the query server
+TOP_WORDS = 10
+# Comments listed by a word drill-down
+DRILLDOWN_LIMIT = 20
+# Phrase mining: n-gram lengths, phrases shown per table, and the sketch error bound as a share of
+# each class's phrase total (the sketch keeps ceil(1 / epsilon) - 1 counters)
+PHRASE_SIZES = (2, 3)
+PHRASE_TOP_K = 10
+PHRASE_EPSILON = 0.0005
+# Tokens counted exactly per step before the counts are folded into the sketches
+PHRASE_BATCH_TOKENS = 1_000_000
+# How the review payload is embedded in the page: one object per review, dictionary-encoded
+# columns, or the same columns gzipped and base64-encoded
+PAYLOAD_FORMATS = ('rows', 'columnar', 'columnar-gzip')
+# Reviews encoded per write when streaming the payload into the report
+PAYLOAD_WRITE_BATCH = 5000
+# Counters per (year, platform, sentiment) slice and per sentiment while streaming mode sketches the
+# word counts; a word is guaranteed to be recounted exactly when it makes up more than
+# 1 / (capacity + 1) of its slice's tokens
+WORD_SKETCH_CAPACITY = 2000
+# Stands in for the review payload in the rendered template; write_report streams the data in its place
+PAYLOAD_MARKER = '/*@comments@*/'
+
+# --watch rebuilds once notifications have been quiet this long, but at most this long after the first
+WATCH_DEBOUNCE_SECONDS = 5.0
+WATCH_MAX_WAIT_SECONDS = 60.0
+WATCH_RETRY_SECONDS = 10.0
+# Threads loading tables and rendering reports in --batch mode; also the size of its connection pool
+BATCH_WORKERS = 4
+REPORT_SPEC_KEYS = ('name', 'output', 'table', 'platforms', 'payload', 'shards', 'phrases')
+
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8000
+# Answers kept per query kind (summary, top words, drill-down) by the --serve query server
+QUERY_CACHE_SIZE = 256
+# Rows lowercased and tested per step while a word drill-down looks for its first matches
+DRILLDOWN_SCAN_BLOCK = 2000
+# Column holding a stored polarity; when the reviews table has it the summary aggregates sentiment in SQL too
+STORED_SENTIMENT_COLUMN = 'sentiment_raw'
+SUMMARY_PATH = os.path.join(os.path.dirname(__file__), 'report_summary.json')
+METRICS_PATH = os.path.join(os.path.dirname(__file__), 'report_metrics.json')
+# Stage names recorded by StageProfiler, in pipeline order
+PROFILE_STAGES = ('query', 'snapshot', 'sentiment', 'aggregate', 'phrases', 'spool', 'recount', 'comments', 'word_index', 'shards',
+                  'build_html', 'write', 'summary')
+
+class StageProfiler:
+    # Wall time, CPU time (including reaped worker processes), rows and tracemalloc peak per
+    # pipeline stage. Entering a stage again, e.g. once per streaming chunk, adds to its totals.
+    # A disabled profiler only hands out the record dict, so call sites need no checks.
+    def __init__(self, enabled=False, cprofile_stage=None):
+        self.enabled = enabled
+        self.cprofile_stage = cprofile_stage
+        self.profile = cProfile.Profile() if enabled and cprofile_stage else None
+        self.stages = {}
+        self.open_peaks = []
+        self.started = time.perf_counter()
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        record = {'rows': None}
+        if not self.enabled:
+            yield record
+            return
+        # The peak counter is global; hand what an enclosing stage has seen so far to that stage
+        if self.open_peaks:
+            self.open_peaks[-1] = max(self.open_peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self.open_peaks.append(0)
+        start_memory = tracemalloc.get_traced_memory()[0]
+        start_times = os.times()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        if name == self.cprofile_stage:
+            self.profile.enable()
+        try:
+            yield record
+        finally:
+            if name == self.cprofile_stage:
+                self.profile.disable()
+            wall = time.perf_counter() - start_wall
+            end_times = os.times()
+            cpu = (time.process_time() - start_cpu
+                   + end_times.children_user - start_times.children_user
+                   + end_times.children_system - start_times.children_system)
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(self.open_peaks.pop(), peak)
+            if self.open_peaks:
+                self.open_peaks[-1] = max(self.open_peaks[-1], peak)
+            totals = self.stages.setdefault(name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'rows': None,
+                                                   'peak_traced_bytes': 0, 'retained_bytes': 0})
+            totals['calls'] += 1
+            totals['wall_seconds'] += wall
+            totals['cpu_seconds'] += cpu
+            if record['rows'] is not None:
+                totals['rows'] = (totals['rows'] or 0) + record['rows']
+            totals['peak_traced_bytes'] = max(totals['peak_traced_bytes'], peak)
+            totals['retained_bytes'] += current - start_memory
+
+    def metrics(self, **context):
+        stages = {}
+        for name, totals in self.stages.items():
+            stages[name] = dict(totals, wall_seconds=round(totals['wall_seconds'], 6), cpu_seconds=round(totals['cpu_seconds'], 6))
+            if totals['rows'] and totals['wall_seconds']:
+                stages[name]['rows_per_second'] = round(totals['rows'] / totals['wall_seconds'], 1)
+        return {
+            'generated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'wall_seconds': round(time.perf_counter() - self.started, 6),
+            'peak_traced_bytes': max((totals['peak_traced_bytes'] for totals in self.stages.values()), default=0),
+            'context': context,
+            'stages': stages,
+        }
+
+    def write(self, path, **context):
+        # The metrics JSON, plus a cProfile dump next to it when a stage was profiled
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            pyjson.dump(self.metrics(**context), f, indent=1)
+        os.replace(tmp_path, path)
+        if self.profile is not None:
+            profile_path = f'{os.path.splitext(path)[0]}.{self.cprofile_stage}.prof'
+            self.profile.dump_stats(profile_path)
+            return profile_path
+        return None
+
+    def close(self):
+        if self.enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+def connection_params():
     dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
     load_dotenv(dotenv_path=dotenv_path)
-    conn = psycopg2.connect(
+    return dict(
         host=os.getenv('PGHOST'),
         port=os.getenv('PGPORT'),
         dbname=os.getenv('PGDATABASE'),
         user=os.getenv('PGUSER'),
         password=os.getenv('PGPASSWORD')
     )
-    query = """
+
+def get_connection():
+    return psycopg2.connect(**connection_params())
+
+def check_table_name(table):
+    if not isinstance(table, str) or not TABLE_NAME_RE.fullmatch(table):
+        raise ValueError(f"Invalid table name {table!r}, expected [schema.]name made of letters, digits and underscores")
+    return table
+
+def snapshot_path_for(table):
+    return os.path.join(os.path.dirname(SNAPSHOT_PATH), f'{check_table_name(table)}.parquet')
+
+def reviews_query(since=None, table=REVIEWS_TABLE):
+    query = f"""
     SELECT score, translated_content, review_date, platform
-    FROM zalando_reviews
+    FROM {check_table_name(table)}
     WHERE translated_content IS NOT NULL AND translated_content != ''
-    ORDER BY review_date DESC;
     """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    params = None
+    if since is not None:
+        # Undated reviews have no place relative to the high-water mark, so every run fetches them again
+        query += "AND (review_date >= %(since)s OR review_date IS NULL)\n"
+        params = {'since': since.to_pydatetime()}
+    query += "ORDER BY review_date DESC;"
+    return query, params
+
+def fetch_reviews(conn, since=None, table=REVIEWS_TABLE):
+    query, params = reviews_query(since, table)
+    df = pd.read_sql_query(query, conn, params=params)
     df['review_date'] = pd.to_datetime(df['review_date'])
+    return df
+
+def query_reviews(conn, since=None, table=REVIEWS_TABLE):
+    # Uses the caller's connection (e.g. one lent by a pool) if given, otherwise a short-lived one
+    if conn is not None:
+        return fetch_reviews(conn, since, table)
+    conn = get_connection()
+    try:
+        return fetch_reviews(conn, since, table)
+    finally:
+        conn.close()
+
+def notify_channel(table=REVIEWS_TABLE):
+    # Channel the table's trigger notifies and --watch listens on, e.g. zalando_reviews_changed.
+    # Lowercase, since the unquoted name in LISTEN is folded while pg_notify takes its argument as is.
+    return f"{check_table_name(table).replace('.', '_')}_changed".lower()
+
+def migrations(table=REVIEWS_TABLE):
+    # Idempotent schema changes applied by --migrate. The indexes serve the review_date window of
+    # incremental runs and the year/platform filters of the SQL summary. Indexes and the trigger
+    # live with the table; the trigger function is created in the table's schema when it is given.
+    schema, _, name = check_table_name(table).rpartition('.')
+    function = f'{schema}.{name}_notify' if schema else f'{name}_notify'
+    return [
+        f"CREATE INDEX IF NOT EXISTS {name}_review_date_idx ON {table} (review_date);",
+        f"CREATE INDEX IF NOT EXISTS {name}_platform_review_date_idx ON {table} (platform, review_date);",
+        # One notification per modifying statement for --watch; a bulk insert wakes the daemon once
+        f"""
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{notify_channel(table)}', TG_OP);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """,
+        f"DROP TRIGGER IF EXISTS {name}_notify ON {table};",
+        f"""
+        CREATE TRIGGER {name}_notify
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+        """,
+    ]
+
+def migrate(conn, table=REVIEWS_TABLE):
+    statements = migrations(table)
+    with conn, conn.cursor() as cur:
+        for statement in statements:
+            cur.execute(statement)
+    return len(statements)
+
+def has_stored_sentiment(conn, table=REVIEWS_TABLE):
+    # Resolves the name through the search path like summary_query does, so a namesake in
+    # another schema is never looked at
+    with conn.cursor() as cur:
+        cur.execute("""
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = to_regclass(%(table)s) AND attname = %(column)s AND NOT attisdropped
+        """, {'table': check_table_name(table), 'column': STORED_SENTIMENT_COLUMN})
+        return cur.fetchone() is not None
+
+def summary_query(stored_sentiment=False, table=REVIEWS_TABLE):
+    # One row per (year, platform, score[, sentiment_type]) with its review count and summed
+    # polarity, over the same rows as reviews_query. The text column is only tested for
+    # emptiness, never sent. Thresholds and NULL handling follow sentiment_type() and the page.
+    if stored_sentiment:
+        sentiment = f"""
+        CASE WHEN {STORED_SENTIMENT_COLUMN} > 0.15 THEN 'positive'
+             WHEN {STORED_SENTIMENT_COLUMN} < -0.15 THEN 'negative'
+             ELSE 'neutral' END AS sentiment_type,
+        COUNT(*) AS reviews,
+        SUM(COALESCE({STORED_SENTIMENT_COLUMN}, 0)) AS sentiment_sum,
+        COUNT(*) - COUNT({STORED_SENTIMENT_COLUMN}) AS unscored"""
+        group_by = "1, 2, 3, 4"
+    else:
+        sentiment = """
+        NULL AS sentiment_type,
+        COUNT(*) AS reviews,
+        NULL AS sentiment_sum,
+        COUNT(*) AS unscored"""
+        group_by = "1, 2, 3"
+    return f"""
+    SELECT EXTRACT(YEAR FROM review_date)::int AS year, platform, score,{sentiment}
+    FROM {check_table_name(table)}
+    WHERE translated_content IS NOT NULL AND translated_content != ''
+    GROUP BY {group_by};"""
+
+def get_summary(conn, table=REVIEWS_TABLE):
+    stored_sentiment = has_stored_sentiment(conn, table)
+    with conn.cursor() as cur:
+        cur.execute(summary_query(stored_sentiment, table))
+        rows = cur.fetchall()
+    aggregates = ReportAggregates(stop_words=set())
+    aggregates.add_summary_rows(rows)
+    return aggregates, stored_sentiment
+
+def iter_reviews(conn, chunk_size=STREAM_CHUNK_SIZE, table=REVIEWS_TABLE):
+    # Named cursor keeps the result set on the server; only chunk_size rows are held client-side
+    query, params = reviews_query(table=table)
+    with conn.cursor(name=f"{table.replace('.', '_')}_stream") as cur:
+        cur.itersize = chunk_size
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunk = pd.DataFrame.from_records(rows, columns=REVIEW_COLUMNS)
+            chunk['review_date'] = pd.to_datetime(chunk['review_date'])
+            yield chunk
+
+def sentiment_type(score):
+    if score > 0.15:
+        return 'positive'
+    elif score < -0.15:
+        return 'negative'
+    else:
+        return 'neutral'
+
+def score_texts(texts):
+    analyzer = PatternAnalyzer()
+    return [analyzer.analyze(text).polarity for text in texts]
+
+_worker_analyzer = None
+
+def _init_scoring_worker():
+    global _worker_analyzer
+    _worker_analyzer = PatternAnalyzer()
+
+def _score_batch(texts):
+    return [_worker_analyzer.analyze(text).polarity for text in texts]
+
+def score_texts_parallel(texts, workers=None, batch_size=SCORING_BATCH_SIZE, pool=None):
+    # With a pool from scoring_pool() its workers are reused; otherwise one is started for this call
+    texts = list(texts)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(texts) <= batch_size:
+        return score_texts(texts)
+    batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+    # Each worker builds its own analyzer once; map() hands results back in submission order
+    if pool is not None:
+        return [polarity for batch in pool.map(_score_batch, batches) for polarity in batch]
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches)), initializer=_init_scoring_worker) as pool:
+        return [polarity for batch in pool.map(_score_batch, batches) for polarity in batch]
+
+@contextlib.contextmanager
+def scoring_pool(workers=1, engine='pattern'):
+    # One process pool for every scoring call of a run (each streaming chunk, each --batch table),
+    # or None when scoring stays in this process. Workers start on the first batch handed to them.
+    workers = workers or os.cpu_count() or 1
+    if engine != 'pattern' or workers <= 1:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_scoring_worker) as pool:
+        yield pool
+
+# Same word boundaries as Pattern's tokenizer for plain words, hyphenated words and single punctuation marks
+LEXICON_TOKEN_RE = re.compile(r"\w+(?:-\w+)*|[^\w\s]")
+
+class LexiconScorer:
+    # Batch re-implementation of Pattern's polarity rules over the same lexicon.
+    # The corpus is tokenized once, tokens are factorized into a vocabulary, and the
+    # modifier ("very good"), negation ("not good") and "!" rules are applied with array
+    # lookups instead of a per-word state machine. Emoticons and a few rare rule
+    # interactions are not modelled; bench.py engines reports the disagreement rate.
+    def __init__(self, batch_size=LEXICON_BATCH_SIZE):
+        self.batch_size = batch_size
+        entries = {word: tags for word, tags in pattern_sentiment.items()}
+        self.polarity = {word: tags[None][0] for word, tags in entries.items()}
+        self.intensity = {word: tags[None][2] for word, tags in entries.items()}
+        self.modifiers = {word for word, tags in entries.items() if any(tag in tags for tag in pattern_sentiment.modifiers)}
+        self.negations = set(pattern_sentiment.negations)
+
+    def __call__(self, texts):
+        texts = list(texts)
+        scores = []
+        for start in range(0, len(texts), self.batch_size):
+            scores.extend(self.score_batch(texts[start:start + self.batch_size]))
+        return scores
+
+    def score_batch(self, texts):
+        tokens = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            words = LEXICON_TOKEN_RE.findall(text.lower())
+            tokens.extend(words)
+            lengths[i] = len(words)
+        if not tokens:
+            return [0.0] * len(texts)
+        codes, vocab = pd.factorize(pd.Series(tokens, dtype=object))
+        # Per-vocabulary attributes, broadcast to every token occurrence by code
+        known = np.array([word in self.polarity for word in vocab])[codes]
+        polarity = np.array([self.polarity.get(word, 0.0) for word in vocab])[codes]
+        intensity = np.array([self.intensity.get(word, 1.0) for word in vocab])[codes]
+        modifier = np.array([word in self.modifiers for word in vocab])[codes]
+        negation = np.array([word in self.negations for word in vocab])[codes]
+        bang = np.array([word == '!' for word in vocab])[codes]
+        length = np.array([len(word) for word in vocab])[codes]
+        stripped_length = np.array([len(word.strip("'")) for word in vocab])[codes]
+        doc = np.repeat(np.arange(len(texts)), lengths)
+        positions = np.arange(len(tokens))
+
+        def previous(mask):
+            # Index of the nearest earlier token in the same review where mask holds, else -1
+            last = np.maximum.accumulate(np.where(mask, positions, -1))
+            prev = np.concatenate(([-1], last[:-1]))
+            valid = prev >= 0
+            valid[valid] = doc[prev[valid]] == doc[valid]
+            return np.where(valid, prev, -1)
+
+        ly_modifier = np.array([word in self.modifiers and word.endswith('ly') for word in vocab])[codes]
+        # A negation right after an -ly modifier negates that modifier instead ("really not good")
+        # and leaves the modifier in force for the next word
+        prev_word = previous(known | ((length > 2) & ~negation))
+        consumed = negation & ~known & (prev_word >= 0) & ly_modifier[np.maximum(prev_word, 0)]
+        # A modifier survives unknown words of up to two characters ("really is a good")
+        prev_mod = previous(known | ((length > 2) & ~consumed))
+        merged = known & (prev_mod >= 0) & modifier[np.maximum(prev_mod, 0)] & known[np.maximum(prev_mod, 0)]
+        # A negation survives single characters and punctuation ("not, good")
+        prev_neg = previous(known | (stripped_length > 1))
+        negated = known & (prev_neg >= 0) & (negation & ~consumed)[np.maximum(prev_neg, 0)]
+        # Negating a word inverts the intensity it passes on to the word it modifies
+        effective_intensity = np.where(negated, 1.0 / intensity, intensity)
+        value = np.where(merged, np.clip(polarity * effective_intensity[np.maximum(prev_mod, 0)], -1.0, 1.0), polarity)
+        # Chains of modifier + word form one assessment whose value is that of its last word
+        head = known & ~merged
+        chain = np.cumsum(head) - 1
+        n_chains = int(head.sum())
+        if n_chains == 0:
+            return [0.0] * len(texts)
+        chain_doc = doc[head]
+        last = np.zeros(n_chains, dtype=np.int64)
+        np.maximum.at(last, chain[known], positions[known])
+        chain_value = value[last]
+        chain_negated = np.bincount(chain[known], weights=negated[known], minlength=n_chains) > 0
+        chain_negated[chain[prev_word[consumed]]] = True
+        # Each "!" boosts the latest assessment of its review by 25%
+        bang_chain = chain[bang]
+        bang_valid = bang_chain >= 0
+        bang_valid[bang_valid] = chain_doc[bang_chain[bang_valid]] == doc[bang][bang_valid]
+        boosts = np.bincount(bang_chain[bang_valid], minlength=n_chains)
+        chain_value = np.clip(chain_value * 1.25 ** boosts, -1.0, 1.0)
+        # "not good" = slightly bad, "not bad" = slightly good
+        chain_value = np.where(chain_negated, chain_value * -0.5, chain_value)
+        totals = np.bincount(chain_doc, weights=chain_value, minlength=len(texts))
+        counts = np.bincount(chain_doc, minlength=len(texts))
+        return (totals / np.maximum(counts, 1)).tolist()
+
+@functools.lru_cache(maxsize=None)
+def engine_version(engine='pattern'):
+    # Looked up on first use rather than at import, which needs the installed package metadata
+    return f'{ENGINE_VERSIONS[engine]}/textblob-{package_version("textblob")}'
+
+def make_scorer(workers=1, batch_size=SCORING_BATCH_SIZE, engine='pattern', pool=None):
+    if engine not in SENTIMENT_ENGINES:
+        raise ValueError(f"Unknown sentiment engine {engine!r}, expected one of {', '.join(SENTIMENT_ENGINES)}")
+    if engine == 'lexicon':
+        return LexiconScorer()
+    if workers == 1:
+        return score_texts
+    return functools.partial(score_texts_parallel, workers=workers, batch_size=batch_size, pool=pool)
+
+class SentimentCache:
+    # Polarity per review text, persisted in SQLite and keyed by sha1(analyzer version + text).
+    # Opt-in (--sentiment-cache); it lives in SENTIMENT_CACHE_PATH unless given another path.
+    def __init__(self, path=SENTIMENT_CACHE_PATH, max_entries=SENTIMENT_CACHE_MAX_ENTRIES, version=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version or engine_version('pattern')
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # One cache may serve several threads (--batch); every use of the connection holds the lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS polarity (key BLOB PRIMARY KEY, value REAL NOT NULL, last_used INTEGER NOT NULL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS polarity_last_used ON polarity (last_used)')
+
+    def key(self, text):
+        return hashlib.sha1(f'{self.version}\0{text}'.encode('utf-8')).digest()
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(f'SELECT key, value FROM polarity WHERE key IN ({placeholders})', batch)
+            found.update(rows)
+        return found
+
+    def put_many(self, items):
+        now = int(time.time())
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO polarity (key, value, last_used) VALUES (?, ?, ?)',
+                                  [(key, value, now) for key, value in items])
+
+    def touch(self, keys):
+        now = int(time.time())
+        with self.conn:
+            self.conn.executemany('UPDATE polarity SET last_used = ? WHERE key = ?', [(now, key) for key in keys])
+
+    def evict(self):
+        # Drop the least recently used entries once the cache grows past max_entries
+        size = self.conn.execute('SELECT COUNT(*) FROM polarity').fetchone()[0]
+        excess = size - self.max_entries
+        if excess > 0:
+            with self.conn:
+                self.conn.execute('DELETE FROM polarity WHERE key IN (SELECT key FROM polarity ORDER BY last_used LIMIT ?)', (excess,))
+            self.evictions += excess
+
+    def score(self, texts, scorer=score_texts):
+        keys = [self.key(text) for text in texts]
+        with self.lock:
+            found = self.get_many(set(keys))
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in found:
+                    missing.setdefault(key, text)
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        # Scoring runs outside the lock so other threads can look up their texts meanwhile
+        scored = dict(zip(missing, scorer(list(missing.values())))) if missing else {}
+        with self.lock:
+            if scored:
+                self.put_many(scored.items())
+                found.update(scored)
+            self.touch(set(found) - set(missing))
+            self.evict()
+        return [found[key] for key in keys]
+
+    def stats(self):
+        with self.lock:
+            size = self.conn.execute('SELECT COUNT(*) FROM polarity').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': size,
+            'max_entries': self.max_entries,
+        }
+
+    def close(self):
+        self.conn.close()
+
+def score_sentiment(texts, cache=None, scorer=score_texts):
+    present = texts[texts.notnull()].astype(str)
+    values = cache.score(list(present), scorer) if cache is not None else scorer(list(present))
+    return pd.Series(values, index=present.index, dtype='float64').reindex(texts.index)
+
+def add_sentiment(df, cache=None, scorer=score_texts):
     if 'translated_content' in df.columns:
-        analyzer = PatternAnalyzer()
-        df['sentiment_raw'] = df['translated_content'].apply(lambda text: analyzer.analyze(str(text)).polarity if pd.notnull(text) else None)
+        if 'sentiment_raw' in df.columns:
+            # Only score rows that did not come out of the snapshot with a polarity
+            missing = df['sentiment_raw'].isna()
+            if missing.any():
+                df.loc[missing, 'sentiment_raw'] = score_sentiment(df.loc[missing, 'translated_content'], cache, scorer)
+        else:
+            df['sentiment_raw'] = score_sentiment(df['translated_content'], cache, scorer)
         df['sentiment'] = df['sentiment_raw'].map(lambda x: f"{x:.2f}" if pd.notnull(x) else "")
     if 'sentiment_raw' in df.columns:
-        def sentiment_type(score):
-            if score > 0.15:
-                return 'positive'
-            elif score < -0.15:
-                return 'negative'
-            else:
-                return 'neutral'
         df['sentiment_type'] = df['sentiment_raw'].apply(sentiment_type)
     return df
 
-def get_top_words(df, sentiment_type, stop_words, n=10):
-    sub_df = df[df['sentiment_type'] == sentiment_type]
-    all_text = ' '.join(sub_df['translated_content']).lower()
-    all_text = re.sub(r'[^a-z\s]', '', all_text)
-    words = [word for word in all_text.split() if word not in stop_words and len(word) > 2]
-    word_counts = Counter(words)
+def row_keys(df):
+    # Stable per-review key; zalando_reviews has no id column we can rely on
+    return pd.util.hash_pandas_object(df[['platform', 'review_date', 'translated_content']], index=False)
+
+def load_snapshot(path):
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+def save_snapshot(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    df[SNAPSHOT_COLUMNS].to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def get_data_incremental(snapshot_path=SNAPSHOT_PATH, lookback_days=SNAPSHOT_LOOKBACK_DAYS, cache=None,
+                         scorer=score_texts, engine='pattern', profiler=None, table=REVIEWS_TABLE, conn=None):
+    profiler = profiler or StageProfiler()
+    with profiler.stage('snapshot'):
+        snapshot = load_snapshot(snapshot_path)
+    since = None
+    if snapshot is not None and snapshot['review_date'].notna().any():
+        # High-water mark minus the lookback window; everything from here on, and every undated
+        # review, is replaced by the delta
+        since = snapshot['review_date'].max() - pd.Timedelta(days=lookback_days)
+    with profiler.stage('query') as stage:
+        delta = query_reviews(conn, since, table)
+        stage['rows'] = len(delta)
+    delta['row_key'] = row_keys(delta)
+    if since is None:
+        df = delta
+    else:
+        # Polarities from another engine are not comparable; those rows are scored again
+        if 'sentiment_engine' not in snapshot.columns:
+            snapshot['sentiment_engine'] = 'pattern'
+        snapshot.loc[snapshot['sentiment_engine'] != engine, 'sentiment_raw'] = np.nan
+        # Carry polarity over for rows whose key is unchanged so only new or edited text is scored
+        window = snapshot[(snapshot['review_date'] >= since) | snapshot['review_date'].isna()].drop_duplicates('row_key')
+        delta['sentiment_raw'] = delta['row_key'].map(window.set_index('row_key')['sentiment_raw'])
+        history = snapshot[snapshot['review_date'] < since]
+        df = pd.concat([delta, history], ignore_index=True)
+    with profiler.stage('sentiment') as stage:
+        df = add_sentiment(df, cache, scorer)
+        stage['rows'] = len(df)
+    df['sentiment_engine'] = engine
+    with profiler.stage('snapshot') as stage:
+        save_snapshot(df, snapshot_path)
+        stage['rows'] = len(df)
+    return df
+
+def get_data(incremental=False, snapshot_path=None, cache=None, scorer=score_texts, engine='pattern', profiler=None,
+             table=REVIEWS_TABLE, conn=None):
+    if incremental:
+        return get_data_incremental(snapshot_path or snapshot_path_for(table), cache=cache, scorer=scorer, engine=engine,
+                                    profiler=profiler, table=table, conn=conn)
+    profiler = profiler or StageProfiler()
+    with profiler.stage('query') as stage:
+        df = query_reviews(conn, table=table)
+        stage['rows'] = len(df)
+    with profiler.stage('sentiment') as stage:
+        df = add_sentiment(df, cache, scorer)
+        stage['rows'] = len(df)
+    return df
+
+def get_stop_words():
+    try:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        nltk.download('stopwords')
+    stop_words = set(nltk.corpus.stopwords.words('english'))
+    stop_words.update(['app', 'zalando', 'lounge', 'use', 'get'])
+    return stop_words
+
+class TokenCounts:
+    # Sparse document-term counts built in one pass: each review is tokenized once (same rules
+    # as the page: lowercase, letters only, no stop words, longer than two characters) and any
+    # grouping by sentiment class, platform or year is answered by summing its rows
+    def __init__(self, df, stop_words):
+        tokens = []
+        lengths = np.zeros(len(df), dtype=np.int64)
+        for i, text in enumerate(df['translated_content']):
+            words = re.sub(r'[^a-z\s]', '', str(text).lower()).split()
+            tokens.extend(words)
+            lengths[i] = len(words)
+        codes, vocab = pd.factorize(pd.Series(tokens, dtype=object))
+        doc = np.repeat(np.arange(len(df)), lengths)
+        # Drop stop words and short words at vocabulary level, keeping first-occurrence order
+        keep_word = np.array([len(word) > 2 and word not in stop_words for word in vocab], dtype=bool)
+        keep = keep_word[codes]
+        self.vocab = np.asarray(vocab, dtype=object)[keep_word]
+        self.codes = (np.cumsum(keep_word) - 1)[codes[keep]]
+        self.doc = doc[keep]
+        platform = df['platform'] if 'platform' in df.columns else pd.Series('unknown', index=df.index)
+        self.groups = pd.DataFrame({
+            'sentiment_type': df['sentiment_type'].to_numpy(),
+            'platform': platform.to_numpy(),
+            'year': df['review_date'].dt.year.to_numpy(),
+        })
+
+    def _counters(self, group_codes, n_groups, first_positions=None):
+        # Words are inserted in order of first occurrence within each group so that
+        # Counter.most_common breaks ties exactly like counting the joined text would
+        counters = [Counter() for _ in range(n_groups)]
+        group_of_token = group_codes[self.doc]
+        valid = group_of_token >= 0
+        n_words = max(len(self.vocab), 1)
+        keys = group_of_token[valid] * n_words + self.codes[valid]
+        unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        order = np.lexsort((first, unique // n_words))
+        positions = np.flatnonzero(valid)[first[order]]
+        for key, count, position in zip(unique[order].tolist(), counts[order].tolist(), positions.tolist()):
+            group, word = divmod(key, n_words)
+            counters[group][self.vocab[word]] = count
+            if first_positions is not None:
+                first_positions[group][self.vocab[word]] = position
+        return counters
+
+    def grouped(self, by, first_positions=False):
+        # With first_positions, also returns per group the token position of each word's first occurrence
+        columns = [by] if isinstance(by, str) else list(by)
+        grouper = self.groups.groupby(columns, sort=True)
+        # Rows with a missing key (no platform or no review date) get NaN and are counted in no group
+        group_codes = grouper.ngroup().fillna(-1).astype('int64').to_numpy()
+        keys = grouper.size().index.tolist()
+        if not first_positions:
+            return dict(zip(keys, self._counters(group_codes, len(keys))))
+        firsts = [{} for _ in keys]
+        counters = self._counters(group_codes, len(keys), firsts)
+        return dict(zip(keys, counters)), dict(zip(keys, firsts))
+
+    def total(self, mask=None):
+        group_codes = np.zeros(len(self.groups), dtype=np.int64)
+        if mask is not None:
+            group_codes[~np.asarray(mask, dtype=bool)] = -1
+        return self._counters(group_codes, 1)[0]
+
+def get_top_words(df, sentiment_type, stop_words, n=10, token_counts=None):
+    if token_counts is None:
+        token_counts = TokenCounts(df, stop_words)
+    word_counts = token_counts.total(token_counts.groups['sentiment_type'] == sentiment_type)
     return word_counts.most_common(n)
 
+class FrequentPhrases:
+    # Misra-Gries heavy-hitters summary with at most `capacity` counters. Exact batch counts are
+    # merged in; when more than `capacity` phrases remain, the (capacity + 1)-th largest count is
+    # subtracted from every counter. Each kept count is a lower bound and undercounts by at most
+    # `error`, which never exceeds total / (capacity + 1).
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.total = 0
+        self.error = 0
+
+    def merge(self, counts, total, floor=0):
+        # `floor` is the (capacity + 1)-th largest count of the whole batch when the caller only
+        # passes the phrases that can survive; it keeps the subtracted threshold exact
+        self.total += total
+        merged = Counter(self.counts)
+        merged.update(counts)
+        threshold = floor
+        if len(merged) > self.capacity:
+            threshold = max(threshold, sorted(merged.values(), reverse=True)[self.capacity])
+        if threshold:
+            self.error += threshold
+            merged = {phrase: count - threshold for phrase, count in merged.items() if count > threshold}
+        self.counts = dict(merged)
+
+    def top(self, k=PHRASE_TOP_K):
+        # [(phrase, lower bound, upper bound)] by lower bound, then alphabetically
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(phrase, count, count + self.error) for phrase, count in ranked]
+
+class PhraseMiner:
+    # Top bigrams and trigrams per sentiment class in bounded memory. Phrases are runs of adjacent
+    # tokens of one review after TokenCounts has dropped stop words and short words, as on the
+    # published page. Each step counts PHRASE_BATCH_TOKENS tokens exactly as integer keys and
+    # folds them into one FrequentPhrases per (sentiment, n); only phrases that can stay in a
+    # summary are turned into strings.
+    def __init__(self, sizes=PHRASE_SIZES, epsilon=PHRASE_EPSILON, batch_tokens=PHRASE_BATCH_TOKENS):
+        self.sizes = tuple(sizes)
+        self.capacity = max(int(np.ceil(1 / epsilon)) - 1, 1)
+        self.batch_tokens = batch_tokens
+        self.sketches = {}
+
+    def add(self, token_counts):
+        sentiment_codes, sentiments = pd.factorize(token_counts.groups['sentiment_type'])
+        groups = sentiment_codes[token_counts.doc]
+        vocab_index = {word: i for i, word in enumerate(token_counts.vocab)}
+        doc = token_counts.doc
+        start = 0
+        while start < len(doc):
+            # Batches end on a review boundary so no phrase is split
+            end = min(start + self.batch_tokens, len(doc))
+            if end < len(doc):
+                end = int(np.searchsorted(doc, doc[end], 'left'))
+                if end <= start:
+                    end = int(np.searchsorted(doc, doc[start], 'right'))
+            self._add_batch(token_counts.codes[start:end], doc[start:end], groups[start:end], token_counts.vocab,
+                            vocab_index, list(sentiments))
+            start = end
+
+    def _add_batch(self, codes, doc, groups, vocab, vocab_index, sentiments):
+        # Renumber the batch's words densely so an n-gram fits one int64 key
+        batch_vocab, local = np.unique(codes, return_inverse=True)
+        size = len(batch_vocab)
+        for n in self.sizes:
+            m = len(local) - n + 1
+            if m <= 0:
+                continue
+            same_review = groups[:m] >= 0
+            for j in range(1, n):
+                same_review &= doc[j:j + m] == doc[:m]
+            keys = np.zeros(m, dtype=np.int64)
+            for j in range(n):
+                keys = keys * size + local[j:j + m]
+            for group, sentiment in enumerate(sentiments):
+                selected = keys[same_review & (groups[:m] == group)]
+                if not len(selected):
+                    continue
+                sketch = self.sketches.setdefault((sentiment, n), FrequentPhrases(self.capacity))
+                unique, counts = np.unique(selected, return_counts=True)
+                floor = 0
+                wanted = np.ones(len(unique), dtype=bool)
+                if len(unique) > sketch.capacity:
+                    # Phrases at or below the batch's own (capacity + 1)-th count are dropped by the
+                    # merge unless the summary already tracks them
+                    floor = int(np.partition(counts, len(counts) - sketch.capacity - 1)[len(counts) - sketch.capacity - 1])
+                    tracked = [self._key(phrase, vocab_index, batch_vocab) for phrase in sketch.counts]
+                    wanted = (counts > floor) | np.isin(unique, [key for key in tracked if key is not None])
+                phrases = {self._phrase(key, n, batch_vocab, vocab): count
+                           for key, count in zip(unique[wanted].tolist(), counts[wanted].tolist())}
+                sketch.merge(phrases, int(counts.sum()), floor)
+
+    @staticmethod
+    def _key(phrase, vocab_index, batch_vocab):
+        key = 0
+        for word in phrase.split(' '):
+            code = vocab_index.get(word)
+            position = int(np.searchsorted(batch_vocab, code)) if code is not None else len(batch_vocab)
+            if position >= len(batch_vocab) or batch_vocab[position] != code:
+                return None
+            key = key * len(batch_vocab) + position
+        return key
+
+    @staticmethod
+    def _phrase(key, n, batch_vocab, vocab):
+        words = []
+        for _ in range(n):
+            key, position = divmod(key, len(batch_vocab))
+            words.append(vocab[batch_vocab[position]])
+        return ' '.join(reversed(words))
+
+    def top(self, sentiment, n, k=PHRASE_TOP_K):
+        sketch = self.sketches.get((sentiment, n))
+        return sketch.top(k) if sketch else []
+
+def format_review_date(value):
+    # Display date and year for one review_date value: timestamps and dates as they are, strings
+    # parsed by pandas and kept verbatim when unparseable, anything else blank
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date)):
+        if not pd.isna(value):
+            return value.strftime('%Y-%m-%d'), value.year
+    elif isinstance(value, str):
+        try:
+            parsed = pd.to_datetime(value)
+            if not pd.isna(parsed):
+                return parsed.strftime('%Y-%m-%d'), parsed.year
+        except Exception:
+            return value, None
+    return '', None
+
+def review_dates(dates):
+    # Column-wise format_review_date. A datetime column is formatted in one pass; anything else
+    # (strings, mixed objects) is formatted once per distinct value, since reviews share dates.
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        missing = dates.isna().to_numpy()
+        date_str = np.where(missing, '', dates.dt.strftime('%Y-%m-%d').to_numpy(dtype=object))
+        years = np.where(missing, None, dates.dt.year.fillna(0).astype('int64').to_numpy(dtype=object))
+        return date_str.tolist(), years.tolist()
+    codes, uniques = pd.factorize(dates.astype(object))
+    formatted = [format_review_date(value) for value in uniques] + [('', None)]
+    date_str = np.array([date for date, _ in formatted], dtype=object)
+    years = np.array([year for _, year in formatted], dtype=object)
+    # Missing values get code -1, which picks the trailing blank entry
+    return date_str[codes].tolist(), years[codes].tolist()
+
+def review_words(content):
+    # Lowercased review text, '' for None/NaN. Lowercasing runs on an object column so it follows
+    # str.lower() exactly (the Arrow-backed string dtype lowercases some characters differently).
+    values = content.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    for i in np.flatnonzero(missing):
+        # Only None and float NaN count as no text; other missing markers are printed as-is
+        missing[i] = values[i] is None or isinstance(values[i], float)
+    words = pd.Series(np.where(missing, '', values), dtype=object).str.lower().to_numpy(dtype=object)
+    # Non-string values come back as NaN from .str
+    for i in np.flatnonzero(pd.isna(words)):
+        words[i] = str(values[i]).lower()
+    return words.tolist()
+
 def get_all_comments(df):
-    all_comments = []
-    for row in df.itertuples(index=False):
-        content = row.translated_content
-        if content is not None and not (isinstance(content, float) and pd.isna(content)):
-            words = str(content).lower()
+    # Column-wise equivalent of building one dict per df.itertuples() row
+    date_str, years = review_dates(df['review_date'])
+    platforms = df['platform'].tolist() if 'platform' in df.columns else ['unknown'] * len(df)
+    columns = zip(df['score'].tolist(), df['sentiment'].tolist(), df['sentiment_raw'].tolist(), df['sentiment_type'].tolist(),
+                  df['translated_content'].tolist(), date_str, years, review_words(df['translated_content']), platforms)
+    return [
+        {
+            'score': score,
+            'sentiment': sentiment,
+            'sentiment_raw': sentiment_raw,
+            'sentiment_type': sentiment_type,
+            'review': review,
+            'date': date,
+            'year': year,
+            'words': text,
+            'platform': platform
+        }
+        for score, sentiment, sentiment_raw, sentiment_type, review, date, year, text, platform in columns
+    ]
+
+def js_to_fixed_2(value):
+    # What the page's value.toFixed(2) prints: exact binary value, ties away from zero
+    text = format(Decimal(abs(value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP), 'f')
+    return '-' + text if value < 0 else text
+
+@functools.lru_cache(maxsize=100_000)
+def date_ordinal(date):
+    # Day number of an ISO review date string; None when it is empty or does not parse
+    if not date:
+        return None
+    try:
+        return datetime.date.fromisoformat(date).toordinal()
+    except ValueError:
+        return None
+
+def comment_date_base(comment_chunks):
+    # The earliest parseable review date over all chunks; encode_comments stores days since it
+    known = [ordinal for comments in comment_chunks for ordinal in {date_ordinal(comment['date']) for comment in comments}
+             if ordinal is not None]
+    return min(known) if known else datetime.date(1970, 1, 1).toordinal()
+
+def encode_comments(all_comments, platforms, base=None, start=0):
+    # Parallel arrays instead of one dict per review: platform and sentiment_type become small
+    # integer codes, dates become day offsets, and the formatted sentiment and lowercased `words`
+    # copies are dropped because the page derives them. The rare values the page cannot derive
+    # exactly (Python and JS round .xx5 ties differently; unparseable date strings) are kept as
+    # sparse {row: text} overrides. A chunk of a longer run passes the run's date base and the
+    # row number of its first review.
+    sentiments = ['positive', 'neutral', 'negative']
+    if base is None:
+        base = comment_date_base([all_comments])
+    columns = {'score': [], 'sentiment_raw': [], 'sentiment_type': [], 'platform': [], 'date': [], 'review': []}
+    sentiment_text = {}
+    date_text = {}
+    for i, comment in enumerate(all_comments, start):
+        raw = comment['sentiment_raw']
+        if raw is not None and pd.isna(raw):
+            raw = None
+        columns['score'].append(comment['score'])
+        columns['sentiment_raw'].append(raw)
+        if raw is not None and js_to_fixed_2(raw) != comment['sentiment']:
+            sentiment_text[i] = comment['sentiment']
+        columns['sentiment_type'].append(sentiments.index(comment['sentiment_type']) if comment['sentiment_type'] in sentiments else -1)
+        columns['platform'].append(platforms.index(comment['platform']) if comment['platform'] in platforms else -1)
+        ordinal = date_ordinal(comment['date'])
+        columns['date'].append(None if ordinal is None else ordinal - base)
+        if comment['date'] and ordinal is None:
+            date_text[i] = comment['date']
+        review = comment['review']
+        columns['review'].append(None if review is None or (isinstance(review, float) and pd.isna(review)) else review)
+    columns.update({
+        'date_base': datetime.date.fromordinal(base).isoformat(),
+        'platforms': platforms,
+        'sentiments': sentiments,
+        'sentiment_text': sentiment_text,
+        'date_text': date_text,
+    })
+    return columns
+
+class ColumnarSpill:
+    # The JSON of encode_comments over a run of comment lists, built without holding the run: each
+    # list's column pieces are appended to a temporary file as it is added, and iterating stitches
+    # every column's pieces back together in order. With ids, an 'id' column follows the others.
+    FIXED_COLUMNS = ('date_base', 'platforms', 'sentiments')
+
+    def __init__(self, platforms, base, with_ids=False, batch_size=PAYLOAD_WRITE_BATCH):
+        self.platforms = platforms
+        self.base = base
+        self.with_ids = with_ids
+        self.batch_size = batch_size
+        self.file = tempfile.TemporaryFile()
+        # (column, offset, length) of every piece, in the order written
+        self.pieces = []
+        self.rows = 0
+
+    def add(self, comments, ids=None):
+        columns = encode_comments(comments, self.platforms, self.base, self.rows)
+        if self.with_ids:
+            columns['id'] = ids
+        for name, values in columns.items():
+            if name in self.FIXED_COLUMNS:
+                continue
+            if isinstance(values, list):
+                pieces = [encode_json(values[start:start + self.batch_size])[1:-1] for start in range(0, len(values), self.batch_size)]
+            else:
+                pieces = [encode_json(values)[1:-1]] if values else []
+            for piece in pieces:
+                self.pieces.append((name, self.file.tell(), len(piece)))
+                self.file.write(piece)
+        self.rows += len(comments)
+
+    def __iter__(self):
+        columns = encode_comments([], self.platforms, self.base)
+        if self.with_ids:
+            columns['id'] = []
+        for i, (name, value) in enumerate(columns.items()):
+            yield (b'{' if i == 0 else b',') + encode_json(name) + b':'
+            if name in self.FIXED_COLUMNS:
+                yield encode_json(value)
+                continue
+            yield b'[' if isinstance(value, list) else b'{'
+            first = True
+            for column, offset, length in self.pieces:
+                if column == name:
+                    self.file.seek(offset)
+                    yield (b'' if first else b',') + self.file.read(length)
+                    first = False
+            yield b']' if isinstance(value, list) else b'}'
+        yield b'}'
+
+    def close(self):
+        self.file.close()
+
+def write_shards(comment_chunks, platforms, data_dir, skip_unchanged=False):
+    # One columnar file per (year, platform) slice, matching the slices of the page's word index,
+    # so a drill-down only downloads the years and platforms it shows. Each shard carries the
+    # global comment ids its rows have in the run of comment_chunks. Reviews without a year are
+    # never shown by the page and are left out. The chunks are read twice, once for every shard's
+    # date base and once to spill the shards' columns. Returns the manifest and whether any file
+    # was replaced or removed; with skip_unchanged, shards matching the existing files are kept.
+    os.makedirs(data_dir, exist_ok=True)
+
+    def shard_key(comment):
+        return int(comment['year']), platforms.index(comment['platform']) if comment['platform'] in platforms else -1
+
+    total = 0
+    bases = {}
+    for comments in comment_chunks:
+        total += len(comments)
+        for comment in comments:
+            if comment['year'] is None:
+                continue
+            key = shard_key(comment)
+            ordinal = date_ordinal(comment['date'])
+            if key not in bases or (ordinal is not None and (bases[key] is None or ordinal < bases[key])):
+                bases[key] = ordinal
+    spills = {key: ColumnarSpill(platforms, datetime.date(1970, 1, 1).toordinal() if base is None else base, with_ids=True)
+              for key, base in bases.items()}
+    shards = []
+    changed = False
+    try:
+        comment_id = 0
+        for comments in comment_chunks:
+            rows = {}
+            for comment in comments:
+                if comment['year'] is not None:
+                    rows.setdefault(shard_key(comment), []).append((comment_id, comment))
+                comment_id += 1
+            for key, items in rows.items():
+                spills[key].add([comment for _, comment in items], [i for i, _ in items])
+        for (year, platform_index), spill in sorted(spills.items()):
+            slug = re.sub(r'[^a-z0-9]+', '-', str(platforms[platform_index]).lower()).strip('-') if platform_index >= 0 else 'unknown'
+            file_name = f'{year}-{platform_index + 1}-{slug}.json'
+            changed |= write_file(os.path.join(data_dir, file_name), spill, skip_unchanged)
+            shards.append({'year': year, 'platform': platform_index, 'file': file_name, 'count': spill.rows})
+    finally:
+        for spill in spills.values():
+            spill.close()
+    manifest = {'base': os.path.basename(data_dir) + '/', 'total': total, 'shards': shards}
+    changed |= write_file(os.path.join(data_dir, 'manifest.json'), [pyjson.dumps(manifest, indent=1).encode('utf-8')],
+                          skip_unchanged)
+    # Drop shards left over from an earlier run with other years or platforms
+    current = {shard['file'] for shard in shards} | {'manifest.json'}
+    for file_name in os.listdir(data_dir):
+        if file_name.endswith('.json') and file_name not in current:
+            os.remove(os.path.join(data_dir, file_name))
+            changed = True
+    return manifest, changed
+
+def encode_json(value):
+    # Compact UTF-8 JSON; orjson when installed, the standard library otherwise
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return pyjson.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def iter_comment_payload(comment_chunks, platforms, payload='columnar', batch_size=PAYLOAD_WRITE_BATCH):
+    # The page's review payload for a run of comment lists (one list, or one per streaming chunk);
+    # the columnar formats read the chunks twice, for the date base and for the columns
+    if payload not in PAYLOAD_FORMATS:
+        raise ValueError(f"Unknown payload format {payload!r}, expected one of {', '.join(PAYLOAD_FORMATS)}")
+    if payload == 'rows':
+        yield b'['
+        first = True
+        for comments in comment_chunks:
+            for start in range(0, len(comments), batch_size):
+                yield (b'' if first else b',') + encode_json(comments[start:start + batch_size])[1:-1]
+                first = False
+        yield b']'
+        return
+    if payload == 'columnar-gzip':
+        # Compress and base64-encode as the columns are produced; base64 works on 3-byte groups,
+        # so up to two bytes are carried over to the next piece
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+        pending = b''
+        yield b'{"gzip":"'
+        for chunk in iter_comment_payload(comment_chunks, platforms, 'columnar', batch_size):
+            pending += compressor.compress(chunk)
+            cut = len(pending) - len(pending) % 3
+            if cut:
+                yield base64.b64encode(pending[:cut])
+                pending = pending[cut:]
+        yield base64.b64encode(pending + compressor.flush())
+        yield b'"}'
+        return
+    spill = ColumnarSpill(platforms, comment_date_base(comment_chunks), batch_size=batch_size)
+    try:
+        for comments in comment_chunks:
+            spill.add(comments)
+        yield from spill
+    finally:
+        spill.close()
+
+def comment_payload(all_comments, platforms, payload='columnar'):
+    return b''.join(iter_comment_payload([all_comments], platforms, payload)).decode('utf-8')
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(functools.partial(f.read, 1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def write_file(path, chunks, skip_unchanged=False):
+    # Writes through a temporary file so an open or served file is never seen half written. With
+    # skip_unchanged, bytes matching the existing file are discarded, leaving the file and its
+    # mtime alone. Returns whether the file was replaced.
+    tmp_path = path + '.tmp'
+    digest = hashlib.sha256()
+    with open(tmp_path, 'wb') as f:
+        for chunk in chunks:
+            digest.update(chunk)
+            f.write(chunk)
+    if skip_unchanged and os.path.exists(path) and file_sha256(path) == digest.hexdigest():
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+def write_report(path, html, payload_chunks, skip_unchanged=False):
+    # Writes the rendered template with the review payload streamed in at PAYLOAD_MARKER
+    head, tail = html.split(PAYLOAD_MARKER, 1)
+    return write_file(path, itertools.chain([head.encode('utf-8')], payload_chunks, [tail.encode('utf-8')]), skip_unchanged)
+
+def build_word_index(comment_chunks, top_word_tables, platforms, limit=DRILLDOWN_LIMIT):
+    # For each sentiment and clickable word, the first `limit` comment ids per (year, platform)
+    # in the page's display order. The key '' holds the same lists without a word filter. The page
+    # merges the selected slices and keeps the first `limit`, which is exact because no slice can
+    # contribute more than its own first `limit`. For the same reason each chunk of a run only
+    # needs its own first `limit` per list, merged into what the earlier chunks kept.
+    kept = {'negative': [], 'positive': []}
+    offset = 0
+    for comments in comment_chunks:
+        frame = pd.DataFrame(comments, columns=['score', 'sentiment_raw', 'review', 'date', 'year', 'words', 'platform'])
+        frame['id'] = np.arange(offset, offset + len(frame))
+        offset += len(frame)
+        frame = frame[frame['year'].notna()]
+        frame['platform_index'] = [platforms.index(plat) if plat in platforms else -1 for plat in frame['platform']]
+        # Same test as the page used: at least ten whitespace-separated words
+        frame['long_enough'] = [len(str(review).split()) >= 10 if review else False for review in frame['review']]
+        for sentiment in ('negative', 'positive'):
+            if sentiment == 'negative':
+                sub = frame[frame['sentiment_raw'] < -0.15]
+            else:
+                sub = frame[frame['sentiment_raw'] > 0.15]
+            sub = display_order(sub, sentiment)
+            rows = [sub.groupby(['year', 'platform_index'], sort=True).head(limit).assign(word='')]
+            # Word boundaries as in the page's /\bword\b/i test: whole ASCII \w runs
+            candidates = set(top_word_tables[sentiment]['words'])
+            long_enough = sub[sub['long_enough']]
+            tokens = [sorted(candidates.intersection(re.findall(r'\w+', words or '', re.ASCII))) for words in long_enough['words']]
+            exploded = long_enough.assign(word=tokens).explode('word').dropna(subset=['word'])
+            rows.append(exploded.groupby(['word', 'year', 'platform_index'], sort=True).head(limit))
+            merged = pd.concat(kept[sentiment] + [part[['word', 'year', 'platform_index', 'date', 'sentiment_raw', 'score', 'id']]
+                                                  for part in rows])
+            kept[sentiment] = [display_order(merged, sentiment).groupby(['word', 'year', 'platform_index'], sort=True).head(limit)]
+    index = {}
+    for sentiment, frames in kept.items():
+        index[sentiment] = {'': []}
+        for word, rows in pd.concat(frames).groupby('word', sort=True) if frames else []:
+            index[sentiment][word] = [[int(year), int(plat), group['id'].tolist()]
+                                      for (year, plat), group in rows.groupby(['year', 'platform_index'], sort=True)]
+    return index
+
+def display_order(frame, sentiment):
+    # Newest first, then most negative/positive, then lowest/highest score; ties keep report order
+    if sentiment == 'negative':
+        return frame.sort_values(['date', 'sentiment_raw', 'score', 'id'], ascending=[False, True, True, True], kind='stable')
+    return frame.sort_values(['date', 'sentiment_raw', 'score', 'id'], ascending=[False, False, False, True], kind='stable')
+
+class ReportAggregates:
+    # Running totals for the summary tables, folded chunk by chunk so the full frame is never needed
+    def __init__(self, stop_words, word_capacity=None):
+        self.stop_words = stop_words
+        self.rows = 0
+        self.score_counts = Counter()
+        self.cross_tab = Counter()
+        self.years = set()
+        self.platforms = set()
+        self.word_counts = {'negative': Counter(), 'positive': Counter()}
+        # (year, platform, score, sentiment_type) -> review count / summed sentiment_raw
+        self.cube_counts = Counter()
+        self.cube_sums = Counter()
+        # (year, platform, sentiment_type) -> word Counter, and -> {word: token position of its first occurrence}
+        self.tokens = 0
+        self.slice_word_counts = {}
+        self.slice_first_positions = {}
+        # Reviews counted without a polarity (only from SQL summaries)
+        self.unscored = 0
+        # With a word_capacity the word counts above stay empty while chunks are added: each slice
+        # and sentiment gets a FrequentPhrases sketch of that many counters instead, and
+        # recount_words() fills the counts exactly for every word a sketch kept
+        self.word_capacity = word_capacity
+        self.word_sketches = {}
+
+    def add(self, df, token_counts=None):
+        self.rows += len(df)
+        self.score_counts.update(df['score'].value_counts().to_dict())
+        self.cross_tab.update(df.groupby(['score', 'sentiment_type']).size().to_dict())
+        self.years.update(int(year) for year in df['review_date'].dt.year.dropna().unique())
+        self.platforms.update(df['platform'].dropna().unique())
+        self.add_cube(df)
+        if token_counts is None:
+            token_counts = TokenCounts(df, self.stop_words)
+        if self.word_capacity is None:
+            self.add_words(token_counts)
         else:
-            words = ''
-        date_val = row.review_date
-        date_str = ''
-        year_val = None
-        if isinstance(date_val, (pd.Timestamp, datetime.datetime, datetime.date)):
-            if not pd.isna(date_val):
-                date_str = date_val.strftime('%Y-%m-%d')
-                year_val = date_val.year
-        elif isinstance(date_val, str):
-            try:
-                parsed = pd.to_datetime(date_val)
-                if not pd.isna(parsed):
-                    date_str = parsed.strftime('%Y-%m-%d')
-                    year_val = parsed.year
-            except Exception:
-                date_str = date_val
-                year_val = None
-        all_comments.append({
-            'score': row.score,
-            'sentiment': row.sentiment,
-            'sentiment_raw': row.sentiment_raw,
-            'sentiment_type': row.sentiment_type,
-            'review': content,
-            'date': date_str,
-            'year': year_val,
-            'words': words,
-            'platform': getattr(row, 'platform', 'unknown')
-        })
-    return all_comments
+            self.sketch_words(token_counts)
+
+    def add_words(self, token_counts, vocabulary=None):
+        # Exact counts and first positions, optionally only for the words in vocabulary
+        for sentiment, counts in token_counts.grouped('sentiment_type').items():
+            if sentiment in self.word_counts:
+                if vocabulary is not None:
+                    counts = {word: count for word, count in counts.items() if word in vocabulary}
+                self.word_counts[sentiment].update(counts)
+        slice_counts, slice_firsts = token_counts.grouped(['year', 'platform', 'sentiment_type'], first_positions=True)
+        for (year, plat, sentiment), counts in slice_counts.items():
+            if sentiment in self.word_counts:
+                key = (int(year), plat, sentiment)
+                if vocabulary is not None:
+                    counts = {word: count for word, count in counts.items() if word in vocabulary}
+                self.slice_word_counts.setdefault(key, Counter()).update(counts)
+                first_positions = self.slice_first_positions.setdefault(key, {})
+                for word in counts:
+                    first_positions.setdefault(word, self.tokens + slice_firsts[(year, plat, sentiment)][word])
+        self.tokens += len(token_counts.codes)
+
+    def sketch_words(self, token_counts):
+        for sentiment, counts in token_counts.grouped('sentiment_type').items():
+            if sentiment in self.word_counts:
+                self.word_sketches.setdefault(sentiment, FrequentPhrases(self.word_capacity)).merge(counts, sum(counts.values()))
+        for (year, plat, sentiment), counts in token_counts.grouped(['year', 'platform', 'sentiment_type']).items():
+            if sentiment in self.word_counts:
+                key = (int(year), plat, sentiment)
+                self.word_sketches.setdefault(key, FrequentPhrases(self.word_capacity)).merge(counts, sum(counts.values()))
+
+    def recount_words(self, frames):
+        # Second pass over the scored chunks after sketch_words: the union of the words any sketch
+        # kept is counted exactly, so the word tables match an in-memory run whenever every word
+        # they show made up more than 1 / (word_capacity + 1) of its slice's tokens
+        vocabulary = set()
+        for sketch in self.word_sketches.values():
+            vocabulary.update(sketch.counts)
+        self.word_sketches = {}
+        self.tokens = 0
+        for frame in frames:
+            self.add_words(TokenCounts(frame, self.stop_words), vocabulary)
+
+    def add_cube(self, df):
+        platform = df['platform'] if 'platform' in df.columns else pd.Series('unknown', index=df.index)
+        frame = pd.DataFrame({
+            'year': df['review_date'].dt.year,
+            'platform': platform,
+            'score': df['score'],
+            'sentiment_type': df['sentiment_type'],
+            # Same as the page's parseFloat(sentiment_raw) || 0
+            'sentiment_raw': df['sentiment_raw'].fillna(0),
+        }).dropna(subset=['year'])
+        cells = frame.groupby(['year', 'platform', 'score', 'sentiment_type'], dropna=False)['sentiment_raw'].agg(['size', 'sum'])
+        for (year, plat, score, sentiment), count, total in zip(cells.index, cells['size'], cells['sum']):
+            key = (int(year), None if pd.isna(plat) else plat, None if pd.isna(score) else int(score), sentiment)
+            self.cube_counts[key] += int(count)
+            self.cube_sums[key] += float(total)
+
+    def add_summary_rows(self, rows):
+        # Folds pre-grouped (year, platform, score, sentiment_type, count, sentiment sum, unscored)
+        # rows from summary_query with the same rules add() applies to a frame. sentiment_type is
+        # None when polarity is not stored, which leaves the cross-tab and cube empty.
+        for year, plat, score, sentiment, count, total, unscored in rows:
+            self.rows += count
+            self.unscored += unscored
+            if score is not None:
+                self.score_counts[score] += count
+            if year is not None:
+                self.years.add(int(year))
+            if plat is not None:
+                self.platforms.add(plat)
+            if sentiment is None:
+                continue
+            if score is not None:
+                self.cross_tab[(score, sentiment)] += count
+            if year is not None:
+                key = (int(year), plat, score, sentiment)
+                self.cube_counts[key] += count
+                self.cube_sums[key] += float(total)
+
+    def cube(self, platforms):
+        # Compact cells for the page: [year, platform index, score, sentiment index, count, sentiment sum]
+        sentiments = ['positive', 'neutral', 'negative']
+        cells = []
+        for key in sorted(self.cube_counts, key=lambda k: (k[0], str(k[1]), k[2] or 0, k[3])):
+            year, plat, score, sentiment = key
+            cells.append([
+                year,
+                platforms.index(plat) if plat in platforms else -1,
+                score,
+                sentiments.index(sentiment),
+                self.cube_counts[key],
+                round(self.cube_sums[key], 6),
+            ])
+        return {'platforms': platforms, 'sentiments': sentiments, 'cells': cells}
+
+    def top_word_tables(self, platforms, n=TOP_WORDS):
+        # Per sentiment: every word that is among the top n of some selection the page offers (a
+        # year range and one or all platforms), and for each slice the counts of those words plus
+        # where each first occurs, so the page can merge the selected slices without seeing the
+        # text and still break ties in text order. A word left out never reaches a top n, so the
+        # merged ranking is the one counting the selected text gives.
+        tables = {}
+        for sentiment in ('negative', 'positive'):
+            slices = {key: counts for key, counts in self.slice_word_counts.items() if key[2] == sentiment}
+            candidates = self.selection_top_words(slices, platforms, n)
+            words = sorted(candidates, key=lambda word: (-self.word_counts[sentiment][word], word))
+            rows = []
+            for key, counts in sorted(slices.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+                year, plat, _ = key
+                present = [i for i, word in enumerate(words) if counts.get(word)]
+                rows.append([
+                    year,
+                    platforms.index(plat) if plat in platforms else -1,
+                    present,
+                    [counts[words[i]] for i in present],
+                    [self.slice_first_positions[key][words[i]] for i in present],
+                ])
+            tables[sentiment] = {'words': words, 'slices': rows}
+        return tables
+
+    def selection_top_words(self, slices, platforms, n):
+        # Union of the exact top n words, ties to the earliest first occurrence as on the page, over
+        # every year range and platform choice. Each start year and platform choice sums its slices
+        # into dense arrays one end year at a time.
+        vocab = {}
+        arrays = {}
+        for key, counts in slices.items():
+            codes = np.array([vocab.setdefault(word, len(vocab)) for word in counts], dtype=np.int64)
+            firsts = np.array([self.slice_first_positions[key][word] for word in counts], dtype=np.int64)
+            arrays[key] = (codes, np.array(list(counts.values()), dtype=np.int64), firsts)
+        if not vocab:
+            return set()
+        words = np.array(list(vocab), dtype=object)
+        years = [int(year) for year in sorted(self.years)]
+        candidates = set()
+        for platform in [None] + list(range(len(platforms))):
+            by_year = {}
+            for (year, plat, _), parts in arrays.items():
+                if platform is None or plat == platforms[platform]:
+                    by_year.setdefault(year, []).append(parts)
+            for start in range(years[0], years[-1] + 1):
+                totals = np.zeros(len(vocab), dtype=np.int64)
+                firsts = np.full(len(vocab), np.iinfo(np.int64).max)
+                for year in range(start, years[-1] + 1):
+                    if year not in by_year:
+                        continue
+                    for codes, counts, first_positions in by_year[year]:
+                        totals[codes] += counts
+                        firsts[codes] = np.minimum(firsts[codes], first_positions)
+                    present = np.flatnonzero(totals)
+                    if len(present) > n:
+                        # Only words tied with or above the n-th count can make the top n
+                        nth = np.partition(totals[present], len(present) - n)[len(present) - n]
+                        present = present[totals[present] >= nth]
+                    top = present[np.lexsort((firsts[present], -totals[present]))[:n]]
+                    candidates.update(words[top])
+        return candidates
+
+    def cross_tab_frame(self):
+        cross_tab = pd.Series(self.cross_tab, dtype='int64').unstack(fill_value=0).sort_index().sort_index(axis=1)
+        cross_tab.index.name = 'score'
+        cross_tab.columns.name = 'sentiment_type'
+        return cross_tab
+
+    def top_words(self, sentiment_type, n=TOP_WORDS):
+        return self.word_counts[sentiment_type].most_common(n)
+
+class ChunkSpool:
+    # Chunks pickled one after another to a temporary file, so streaming mode can walk the scored
+    # reviews again (exact word counts, drill-down index, payload) without keeping them in memory.
+    # Each iteration reads the chunks back in the order they were appended.
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.chunks = 0
+
+    def append(self, chunk):
+        self.file.seek(0, os.SEEK_END)
+        pickle.dump(chunk, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.chunks += 1
+
+    def __iter__(self):
+        position = 0
+        for _ in range(self.chunks):
+            self.file.seek(position)
+            chunk = pickle.load(self.file)
+            position = self.file.tell()
+            yield chunk
+
+    def close(self):
+        self.file.close()
+
+class CommentChunks:
+    # The comment lists of a sequence of scored frames, built again on every iteration
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __iter__(self):
+        for frame in self.frames:
+            yield get_all_comments(frame)
+
+class ReviewStore:
+    # Read-only columnar copy of the scored reviews behind --serve. A query names a year range and
+    # optionally a platform, and gets the answer the static page would compute in the browser:
+    # the summary panels from the review cube, the top words by merging the full per-slice word
+    # counts, and the drill-down by walking reviews
+    # presorted in display order until `limit` of them match. Recent answers stay in an LRU cache.
+    def __init__(self, df, token_counts, cache_size=QUERY_CACHE_SIZE):
+        self.rows = len(df)
+        self.platforms = sorted(df['platform'].dropna().unique())
+        years = df['review_date'].dt.year
+        self.min_year = int(years.min()) if years.notna().any() else None
+        self.max_year = int(years.max()) if years.notna().any() else None
+        aggregates = ReportAggregates(stop_words=set())
+        aggregates.add_cube(df)
+        cube = aggregates.cube(self.platforms)
+        self.sentiments = cube['sentiments']
+        cells = np.array([[np.nan if value is None else value for value in cell] for cell in cube['cells']], dtype='float64')
+        self.cells = cells.reshape(-1, 6)
+        # Review columns; year and platform are codes with -1 for missing
+        self.year = years.fillna(-1).astype('int64').to_numpy()
+        self.platform = pd.Categorical(df['platform'], categories=self.platforms).codes.astype('int64')
+        self.score = df['score'].to_numpy(dtype=object)
+        self.sentiment_raw = df['sentiment_raw'].to_numpy(dtype='float64', na_value=np.nan)
+        self.sentiment = df['sentiment'].to_numpy(dtype=object)
+        self.review = df['translated_content'].to_numpy(dtype=object)
+        self.date = np.array(review_dates(df['review_date'])[0], dtype=object)
+        self.display_order = {sentiment: self._display_order(df, sentiment) for sentiment in ('negative', 'positive')}
+        self.vocab = token_counts.vocab
+        self.word_slices = self._word_slices(token_counts)
+        self.summary = functools.lru_cache(maxsize=cache_size)(self._summary)
+        self.top_words = functools.lru_cache(maxsize=cache_size)(self._top_words)
+        self.comments = functools.lru_cache(maxsize=cache_size)(self._comments)
+
+    def _display_order(self, df, sentiment):
+        # Row numbers of the reviews a drill-down can show, in the order of build_word_index
+        frame = pd.DataFrame({'date': self.date, 'sentiment_raw': self.sentiment_raw, 'score': df['score'].to_numpy(),
+                              'id': np.arange(len(df))})[self.year >= 0]
+        if sentiment == 'negative':
+            frame = frame[frame['sentiment_raw'] < -0.15]
+        else:
+            frame = frame[frame['sentiment_raw'] > 0.15]
+        return display_order(frame, sentiment)['id'].to_numpy()
+
+    def _word_slices(self, token_counts):
+        # (year, platform index, sentiment) -> word codes with their counts and first token positions;
+        # slices follow ReportAggregates.slice_word_counts, so reviews without a year or platform are left out
+        groups = token_counts.groups
+        year = groups['year'].fillna(-1).astype('int64').to_numpy()
+        platform = pd.Categorical(groups['platform'], categories=self.platforms).codes.astype('int64')
+        sentiment = pd.Index(['negative', 'positive']).get_indexer(groups['sentiment_type']).astype('int64')
+        n_platforms = max(len(self.platforms), 1)
+        valid = (year >= 0) & (platform >= 0) & (sentiment >= 0)
+        group = np.where(valid, (np.maximum(year, 0) * n_platforms + platform) * 2 + sentiment, -1)[token_counts.doc]
+        positions = np.flatnonzero(group >= 0)
+        n_words = max(len(token_counts.vocab), 1)
+        keys = group[positions] * n_words + token_counts.codes[positions]
+        unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        group_of_key = unique // n_words
+        starts = np.flatnonzero(np.r_[True, group_of_key[1:] != group_of_key[:-1]]) if len(unique) else np.array([], dtype=np.int64)
+        slices = {}
+        for start, end in zip(starts.tolist(), np.r_[starts[1:], len(unique)].tolist()):
+            slice_year, rest = divmod(int(group_of_key[start]), n_platforms * 2)
+            slice_platform, slice_sentiment = divmod(rest, 2)
+            key = (slice_year, slice_platform, ('negative', 'positive')[slice_sentiment])
+            slices[key] = (unique[start:end] % n_words, counts[start:end], positions[first[start:end]])
+        return slices
+
+    def platform_code(self, platform):
+        if platform is None:
+            return None
+        if platform not in self.platforms:
+            raise ValueError(f"Unknown platform {platform!r}, expected one of {', '.join(map(str, self.platforms))}")
+        return self.platforms.index(platform)
+
+    def _summary(self, start, end, platform=None):
+        # Totals, reviews per sentiment, star counts and the score x sentiment cross-tab, shaped like the page's summarizeCells()
+        year, platform_index, score, sentiment, count, total = self.cells.T
+        selected = (year >= start) & (year <= end) & ((platform_index == platform) if platform is not None else True)
+        summary = {
+            'total': int(count[selected].sum()),
+            'sentiment_sum': float(total[selected].sum()),
+            'sentiments': {name: int(count[selected & (sentiment == i)].sum()) for i, name in enumerate(self.sentiments)},
+            'stars': {stars: int(count[selected & (score == stars)].sum()) for stars in range(1, 6)},
+            'cross_tab': {},
+        }
+        for value in np.unique(score[selected & ~np.isnan(score)]).tolist():
+            summary['cross_tab'][int(value)] = {name: int(count[selected & (score == value) & (sentiment == i)].sum())
+                                                for i, name in enumerate(self.sentiments)}
+        return summary
+
+    def _top_words(self, start, end, platform, sentiment, n=TOP_WORDS):
+        # [word, count] pairs; ties go to the word that occurs first in the selected reviews, as in the page
+        parts = [value for (year, plat, slice_sentiment), value in self.word_slices.items()
+                 if start <= year <= end and (platform is None or plat == platform) and slice_sentiment == sentiment]
+        if not parts:
+            return []
+        codes, counts, firsts = (np.concatenate(columns) for columns in zip(*parts))
+        order = np.lexsort((firsts, codes))
+        codes, counts, firsts = codes[order], counts[order], firsts[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        totals = np.add.reduceat(counts, starts)
+        ranked = np.lexsort((firsts[starts], -totals))[:n]
+        return [[self.vocab[codes[starts[i]]], int(totals[i])] for i in ranked]
+
+    def _comments(self, start, end, platform, sentiment, word=None, limit=DRILLDOWN_LIMIT):
+        # The page's drill-down rows in display order. Without a word, the first `limit` reviews of the
+        # sentiment; with one, the first `limit` of at least ten words whose text contains it as a whole word.
+        order = self.display_order[sentiment]
+        year = self.year[order]
+        selected = (year >= start) & (year <= end)
+        if platform is not None:
+            selected &= self.platform[order] == platform
+        candidates = order[selected]
+        if not word:
+            return [self.comment(row) for row in candidates[:limit].tolist()]
+        rows = []
+        for block_start in range(0, len(candidates), DRILLDOWN_SCAN_BLOCK):
+            block = candidates[block_start:block_start + DRILLDOWN_SCAN_BLOCK].tolist()
+            texts = review_words(pd.Series(self.review[block], dtype=object))
+            for row, text in zip(block, texts):
+                review = self.review[row]
+                # Same tests as build_word_index: ten whitespace-separated words, whole ASCII \w run
+                if word in text and (len(str(review).split()) >= 10 if review else False) and word in re.findall(r'\w+', text, re.ASCII):
+                    rows.append(self.comment(row))
+                    if len(rows) == limit:
+                        return rows
+        return rows
+
+    def comment(self, row):
+        score = self.score[row]
+        review = self.review[row]
+        return {
+            'score': None if pd.isna(score) else score,
+            'sentiment_raw': float(self.sentiment_raw[row]),
+            'sentiment': self.sentiment[row],
+            'review': None if review is None or (isinstance(review, float) and pd.isna(review)) else review,
+            'date': self.date[row],
+        }
+
+    def view(self, start, end, platform, sentiment, word=None):
+        # Everything one update of the page needs, in a single response
+        return {
+            'summary': self.summary(start, end, platform),
+            'top_words': {name: self.top_words(start, end, platform, name) for name in ('negative', 'positive')},
+            'comments': self.comments(start, end, platform, sentiment, word),
+        }
+
+    def cache_stats(self):
+        return {name: getattr(self, name).cache_info()._asdict() for name in ('summary', 'top_words', 'comments')}
 
 # =====================
 # 2. HTML/JS TEMPLATES
 # =====================
 
-def build_html(min_year, max_year, score_summary_html, cross_tab_html, top_words_html, top_words_pos_html, all_comments, platforms):
+def summary_tables_html(aggregates):
+    # Star rating summary
+    score_counts = aggregates.score_counts
+    score_summary_html = '<table><tr><th>Stars</th><th>Count</th></tr>'
+    for star in range(5, 0, -1):
+        score_summary_html += f'<tr><td>{star}</td><td>{score_counts.get(star, 0)}</td></tr>'
+    score_summary_html += '</table>'
+    # Score vs. sentiment-type cross-tab
+    cross_tab = aggregates.cross_tab_frame()
+    cross_tab_html = cross_tab.to_html(classes='cross-tab', border=0)
+    # Top words
+    top_words = aggregates.top_words('negative')
+    top_words_html = '<table id="top-words" style="margin-bottom:24px;"><tr><th>Word</th><th>Count</th></tr>'
+    for word, count in top_words:
+        top_words_html += f'<tr><td><a href="#" class="word-link" data-word="{word}">{word}</a></td><td>{count:,}</td></tr>'
+    top_words_html += '</table>'
+    top_words_pos = aggregates.top_words('positive')
+    top_words_pos_html = '<table id="top-words-pos" style="margin-bottom:24px;"><tr><th>Word</th><th>Count</th></tr>'
+    for word, count in top_words_pos:
+        top_words_pos_html += f'<tr><td><a href="#" class="word-link-pos" data-word="{word}">{word}</a></td><td>{count:,}</td></tr>'
+    top_words_pos_html += '</table>'
+    return score_summary_html, cross_tab_html, top_words_html, top_words_pos_html
+
+def phrase_tables_html(phrases, k=PHRASE_TOP_K):
+    # Static tables over all years and platforms; a count range means the sketch cannot pin it down further
+    html = '<div class="flex-row">'
+    for sentiment in ('negative', 'neutral', 'positive'):
+        html += f'<div style="flex:1;"><h2>Top Phrases in {sentiment.capitalize()} Reviews</h2>'
+        for n in phrases.sizes:
+            html += f'<table style="margin-bottom:24px;"><tr><th>Top Phrases ({n} words)</th><th>Count</th></tr>'
+            for phrase, low, high in phrases.top(sentiment, n, k):
+                count = f'{low:,}' if low == high else f'{low:,}&ndash;{high:,}'
+                html += f'<tr><td>{phrase}</td><td>{count}</td></tr>'
+            html += '</table>'
+        html += '</div>'
+    html += '</div>'
+    return html
+
+def build_html(min_year, max_year, score_summary_html, cross_tab_html, top_words_html, top_words_pos_html, platforms, cube,
+               top_word_tables, word_index, manifest=None, phrases_html='', api=None):
     return f'''<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -169,6 +1714,7 @@ def build_html(min_year, max_year, score_summary_html, cross_tab_html, top_words
             <div id="top-words-pos"></div>
         </div>
     </div>
+    {phrases_html}
     <h2 id="comments-title" style="display:none;">Top 20 Most Negative Comments</h2>
     <table id="comments-table" style="display:none;">
         <thead>
@@ -184,9 +1730,48 @@ def build_html(min_year, max_year, score_summary_html, cross_tab_html, top_words
 </div>
 <script src="https://cdnjs.cloudflare.com/ajax/libs/noUiSlider/15.7.1/nouislider.min.js"></script>
 <script>
-document.addEventListener('DOMContentLoaded', function() {{
-const allComments = {pyjson.dumps(all_comments)};
+async function loadComments(data) {{
+    // Accepts any of the payload formats and returns lazy access to reviews by id
+    if (Array.isArray(data)) return {{ get: id => data[id] }};
+    if (data.gzip) {{
+        const bytes = Uint8Array.from(atob(data.gzip), c => c.charCodeAt(0));
+        const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+        data = JSON.parse(await new Response(stream).text());
+    }}
+    const base = Date.parse(data.date_base);
+    return {{
+        get(id) {{
+            const raw = data.sentiment_raw[id];
+            const day = data.date[id];
+            const date = id in data.date_text ? data.date_text[id] : (day === null ? '' : new Date(base + day * 86400000).toISOString().slice(0, 10));
+            return {{
+                score: data.score[id],
+                sentiment_raw: raw,
+                sentiment: raw === null ? '' : (id in data.sentiment_text ? data.sentiment_text[id] : raw.toFixed(2)),
+                sentiment_type: data.sentiments[data.sentiment_type[id]] || null,
+                review: data.review[id],
+                date: date,
+                year: day === null || id in data.date_text ? null : new Date(base + day * 86400000).getUTCFullYear(),
+                platform: data.platform[id] >= 0 ? data.platforms[data.platform[id]] : null,
+            }};
+        }}
+    }};
+}}
+
+document.addEventListener('DOMContentLoaded', async function() {{
+// With sharded output the reviews live in per-(year, platform) files listed here and are fetched on demand
+const shardManifest = {pyjson.dumps(manifest)};
+// Served by --serve: every panel is fetched from the query server under this path instead
+const queryApi = {pyjson.dumps(api)};
+const allComments = shardManifest || queryApi ? null : await loadComments({PAYLOAD_MARKER});
+const shardCache = {{}};
+let renderSeq = 0;
 const platforms = {pyjson.dumps(platforms)};
+// Pre-aggregated [year, platform, score, sentiment, count, sentiment sum] cells for the summary panels
+const cube = {pyjson.dumps(cube)};
+// Per-slice word counts for the top-word tables and per-slice comment ids for word drill-downs
+const topWords = {pyjson.dumps(top_word_tables)};
+const wordIndex = {pyjson.dumps(word_index)};
 let yearStart = {min_year};
 let yearEnd = {max_year};
 let selectedPlatform = null;
@@ -199,7 +1784,7 @@ function renderPlatformFilter(selected = null) {{
     }});
     container.innerHTML = html;
     container.querySelectorAll('.platform-tab').forEach(btn => {{
-        btn.addEventListener('click', function() {{
+        btn.addEventListener('click', async function() {{
             container.querySelectorAll('.platform-tab').forEach(b => b.classList.remove('active'));
             this.classList.add('active');
             let plat = this.getAttribute('data-platform');
@@ -207,7 +1792,7 @@ function renderPlatformFilter(selected = null) {{
             selectedPlatform = plat;
             // Only update data, don't show table unless a word was previously clicked
             const currentlyVisible = document.getElementById('comments-table').style.display !== 'none';
-            updateAll();
+            if (!await updateAll()) return;
             if (!currentlyVisible) {{
                 document.getElementById('comments-table').style.display = 'none';
                 document.getElementById('comments-title').style.display = 'none';
@@ -216,33 +1801,61 @@ function renderPlatformFilter(selected = null) {{
     }});
 }}
 
-function getFiltered() {{
-    let filtered = allComments.filter(r => r.year !== null && r.year >= yearStart && r.year <= yearEnd);
-    if (selectedPlatform) {{
-        filtered = filtered.filter(r => r.platform === selectedPlatform);
+function inSelection(year, platformIndex) {{
+    const selectedIndex = selectedPlatform ? cube.platforms.indexOf(selectedPlatform) : null;
+    return year >= yearStart && year <= yearEnd && (selectedIndex === null || platformIndex === selectedIndex);
+}}
+
+function getCubeCells() {{
+    return cube.cells.filter(c => inSelection(c[0], c[1]));
+}}
+
+function loadShard(year, platformIndex) {{
+    const shard = shardManifest.shards.find(s => s.year === year && s.platform === platformIndex);
+    if (!shard) return Promise.resolve({{ get: () => undefined }});
+    if (!shardCache[shard.file]) {{
+        shardCache[shard.file] = fetch(shardManifest.base + shard.file)
+            .then(response => response.json())
+            .then(async data => {{
+                const comments = await loadComments(data);
+                const position = new Map(data.id.map((id, i) => [id, i]));
+                return {{ get: id => comments.get(position.get(id)) }};
+            }});
     }}
-    return filtered;
+    return shardCache[shard.file];
 }}
 
 function formatNumber(n) {{
     return n.toLocaleString();
 }}
 
-function updateSummary(filtered) {{
-    const total = filtered.length;
-    const avg = filtered.length ? (filtered.reduce((a, b) => a + (parseFloat(b.sentiment_raw)||0), 0) / filtered.length) : 0;
-    const pos = filtered.filter(r => parseFloat(r.sentiment_raw) > 0.15).length / (filtered.length||1) * 100;
-    const neg = filtered.filter(r => parseFloat(r.sentiment_raw) < -0.15).length / (filtered.length||1) * 100;
-    const neu = filtered.filter(r => parseFloat(r.sentiment_raw) >= -0.15 && parseFloat(r.sentiment_raw) <= 0.15).length / (filtered.length||1) * 100;
+function summarizeCells(cells) {{
+    // Same shape as the query server's summary: totals, reviews per sentiment, stars and score x sentiment counts
+    const summary = {{total: 0, sentiment_sum: 0, sentiments: {{positive: 0, neutral: 0, negative: 0}}, stars: {{}}, cross_tab: {{}}}};
+    for (let i = 1; i <= 5; i++) summary.stars[i] = 0;
+    cells.forEach(c => {{
+        const sentiment = cube.sentiments[c[3]];
+        summary.total += c[4];
+        summary.sentiment_sum += c[5];
+        summary.sentiments[sentiment] += c[4];
+        if (c[2] && summary.stars.hasOwnProperty(c[2])) summary.stars[c[2]] += c[4];
+        summary.cross_tab[c[2]] = summary.cross_tab[c[2]] || {{}};
+        summary.cross_tab[c[2]][sentiment] = (summary.cross_tab[c[2]][sentiment] || 0) + c[4];
+    }});
+    return summary;
+}}
+
+function updateSummary(summary) {{
+    const total = summary.total;
+    const byType = summary.sentiments;
+    const avg = total ? summary.sentiment_sum / total : 0;
+    const pos = byType.positive / (total||1) * 100;
+    const neg = byType.negative / (total||1) * 100;
+    const neu = byType.neutral / (total||1) * 100;
     document.getElementById('summary').innerHTML = `<span><b>Total reviews:</b> ${{formatNumber(total)}}</span><span><b>Average sentiment:</b> ${{avg.toFixed(2)}}</span><span><b>% Positive:</b> ${{pos.toFixed(1)}}%</span><span><b>% Neutral:</b> ${{neu.toFixed(1)}}%</span><span><b>% Negative:</b> ${{neg.toFixed(1)}}%</span>`;
 }}
 
-function updateStarTable(filtered) {{
-    const counts = {{}};
-    for (let i = 1; i <= 5; i++) counts[i] = 0;
-    filtered.forEach(r => {{
-        if (r.score && counts.hasOwnProperty(r.score)) counts[r.score]++;
-    }});
+function updateStarTable(counts) {{
     let html = '<table><tr><th>Stars</th><th>Count</th></tr>';
     for (let i = 5; i >= 1; i--) {{
         html += `<tr><td>${{i}}</td><td>${{counts[i]}}</td></tr>`;
@@ -251,7 +1864,7 @@ function updateStarTable(filtered) {{
     document.getElementById('score-summary').innerHTML = html;
 }}
 
-function updateCrossTab(filtered) {{
+function updateCrossTab(counts) {{
     // Build a cross-tab of score vs sentiment_type
     const sentiments = ['positive','neutral','negative'];
     const scores = [5,4,3,2,1];
@@ -261,7 +1874,7 @@ function updateCrossTab(filtered) {{
     scores.forEach(score => {{
         table += `<tr><td>${{score}}</td>`;
         sentiments.forEach(sent => {{
-            const count = filtered.filter(r => r.score === score && r.sentiment_type === sent).length;
+            const count = (counts[score] || {{}})[sent] || 0;
             table += `<td>${{count}}</td>`;
         }});
         table += '</tr>';
@@ -270,15 +1883,26 @@ function updateCrossTab(filtered) {{
     document.getElementById('cross-tab').innerHTML = table;
 }}
 
-function updateTopWords(filtered, sentimentType, id, wordClass) {{
-    // Get top 10 words for the sentimentType
-    const stopWords = new Set({pyjson.dumps(list(set(nltk.corpus.stopwords.words('english')).union({'app','zalando','lounge','use','get'})))});
-    let allText = filtered.filter(r => r.sentiment_type === sentimentType).map(r => r.review ? r.review.toLowerCase() : '').join(' ');
-    allText = allText.replace(/[^a-z\\s]/g, '');
-    let words = allText.split(/\\s+/).filter(w => w && !stopWords.has(w) && w.length > 2);
-    let counts = {{}};
-    words.forEach(w => counts[w] = (counts[w]||0)+1);
-    let sorted = Object.entries(counts).sort((a,b) => b[1]-a[1]).slice(0,10);
+function topWordsInSelection(sentimentType) {{
+    // Get the top words for the sentimentType by merging the selected slices
+    const table = topWords[sentimentType];
+    const counts = new Map();
+    const firstSeen = new Map();
+    table.slices.forEach(s => {{
+        if (!inSelection(s[0], s[1])) return;
+        s[2].forEach((w, i) => {{
+            counts.set(w, (counts.get(w) || 0) + s[3][i]);
+            firstSeen.set(w, Math.min(firstSeen.has(w) ? firstSeen.get(w) : Infinity, s[4][i]));
+        }});
+    }});
+    // Ties go to the word that appears first in the comments, as when counting the text itself
+    return [...counts.entries()]
+        .sort((a, b) => b[1] - a[1] || firstSeen.get(a[0]) - firstSeen.get(b[0]))
+        .slice(0, {TOP_WORDS})
+        .map(([w, count]) => [table.words[w], count]);
+}}
+
+function updateTopWords(sorted, id, wordClass) {{
     let html = `<table id="${{id}}" style="margin-bottom:24px;"><tr><th>Word</th><th>Count</th></tr>`;
     sorted.forEach(([word, count]) => {{
         html += `<tr><td><a href="#" class="${{wordClass}}" data-word="${{word}}">${{word}}</a></td><td>${{formatNumber(count)}}</td></tr>`;
@@ -287,20 +1911,57 @@ function updateTopWords(filtered, sentimentType, id, wordClass) {{
     document.getElementById(id).innerHTML = html;
 }}
 
-function updateAll(wordFilter = null, sentimentType = 'negative') {{
-    const filtered = getFiltered();
-    updateSummary(filtered);
-    updateStarTable(filtered);
-    updateCrossTab(filtered);
-    updateTopWords(filtered, 'negative', 'top-words', 'word-link');
-    updateTopWords(filtered, 'positive', 'top-words-pos', 'word-link-pos');
+function renderPanels(summary, topNegative, topPositive) {{
+    updateSummary(summary);
+    updateStarTable(summary.stars);
+    updateCrossTab(summary.cross_tab);
+    updateTopWords(topNegative, 'top-words', 'word-link');
+    updateTopWords(topPositive, 'top-words-pos', 'word-link-pos');
+}}
+
+async function queryView(wordFilter, sentimentType) {{
+    // One request per update: summary, both top-word lists and the sorted top 20 comments
+    const params = new URLSearchParams({{start: yearStart, end: yearEnd, sentiment: sentimentType}});
+    if (selectedPlatform) params.set('platform', selectedPlatform);
+    if (wordFilter) params.set('word', wordFilter);
+    const response = await fetch(queryApi + 'view?' + params);
+    if (!response.ok) throw new Error(`Query failed: ${{response.status}} ${{await response.text()}}`);
+    return response.json();
+}}
+
+// Resolves to whether it rendered: false when a newer update started while this one was waiting,
+// in which case callers must leave the comments table as the newer update sets it
+async function updateAll(wordFilter = null, sentimentType = 'negative') {{
+    const seq = ++renderSeq;
+    if (queryApi) {{
+        const view = await queryView(wordFilter, sentimentType);
+        // A newer update started while this one was waiting for the server
+        if (seq !== renderSeq) return false;
+        renderPanels(view.summary, view.top_words.negative, view.top_words.positive);
+        renderComments(view.comments, view.comments.length, wordFilter, sentimentType);
+        return true;
+    }}
+    renderPanels(summarizeCells(getCubeCells()), topWordsInSelection('negative'), topWordsInSelection('positive'));
+    // Candidates are the first 20 comments of every selected slice; the index already applied the
+    // sentiment threshold, the word match and the 10-word minimum
+    const entries = (wordIndex[sentimentType][wordFilter || ''] || []).filter(e => inSelection(e[0], e[1]));
+    let ids = [];
+    const sources = [];
+    // Shards are only fetched when the comments table is on screen
     const commentsTable = document.getElementById('comments-table');
-    const tbody = commentsTable.getElementsByTagName('tbody')[0];
-    tbody.innerHTML = '';
-    let toShow = filtered.slice();
+    const tableVisible = commentsTable.style.display !== 'none';
+    if (!shardManifest || wordFilter || tableVisible) {{
+        const loaded = await Promise.all(entries.map(e => shardManifest ? loadShard(e[0], e[1]) : allComments));
+        // A newer update started while shards were loading
+        if (seq !== renderSeq) return false;
+        entries.forEach((e, i) => e[2].forEach(id => {{ ids.push(id); sources.push(loaded[i]); }}));
+    }} else {{
+        entries.forEach(e => ids = ids.concat(e[2]));
+    }}
+    const order = ids.map((id, i) => i).sort((a, b) => ids[a] - ids[b]);
+    const toShow = sources.length ? order.map(i => sources[i].get(ids[i])) : [];
     // Sort by date (newest first), then by sentiment (most negative/positive), then by score
     if (sentimentType === 'negative') {{
-        toShow = toShow.filter(row => parseFloat(row.sentiment_raw) < -0.15);
         toShow.sort((a, b) => {{
             // First by date (newest first)
             const dateA = new Date(a.date);
@@ -312,7 +1973,6 @@ function updateAll(wordFilter = null, sentimentType = 'negative') {{
             return parseFloat(a.score) - parseFloat(b.score);
         }});
     }} else {{
-        toShow = toShow.filter(row => parseFloat(row.sentiment_raw) > 0.15);
         toShow.sort((a, b) => {{
             // First by date (newest first)
             const dateA = new Date(a.date);
@@ -324,32 +1984,31 @@ function updateAll(wordFilter = null, sentimentType = 'negative') {{
             return parseFloat(b.score) - parseFloat(a.score);
         }});
     }}
+    renderComments(toShow, ids.length, wordFilter, sentimentType);
+    return true;
+}}
+
+function renderComments(rows, candidates, wordFilter, sentimentType) {{
+    // rows are already in display order; candidates is how many the title may count (at most 20 are shown)
+    const commentsTable = document.getElementById('comments-table');
+    const tbody = commentsTable.getElementsByTagName('tbody')[0];
+    tbody.innerHTML = '';
     if (wordFilter) {{
-        // Use exact word boundary matching instead of substring matching
-        const wordRegex = new RegExp(`\\b${{wordFilter}}\\b`, 'i');
-        toShow = toShow.filter(row => {{
-            // Filter by word match first
-            if (!row.words || !wordRegex.test(row.words)) return false;
-            // Then filter by minimum comment length (10 words) using the original review text
-            if (!row.review) return false;
-            const wordCount = String(row.review).trim().split(/\\s+/).filter(w => w.length > 0).length;
-            return wordCount >= 10;
-        }});
         document.getElementById('comments-title').innerText = sentimentType === 'negative'
-            ? `Top ${{Math.min(20, toShow.length)}} Most Negative Comments Containing "${{wordFilter}}"`
-            : `Top ${{Math.min(20, toShow.length)}} Most Positive Comments Containing "${{wordFilter}}"`;
+            ? `Top ${{Math.min(20, candidates)}} Most Negative Comments Containing "${{wordFilter}}"`
+            : `Top ${{Math.min(20, candidates)}} Most Positive Comments Containing "${{wordFilter}}"`;
     }} else {{
         document.getElementById('comments-title').innerText = sentimentType === 'negative'
-            ? `Top ${{Math.min(20, toShow.length)}} Most Negative Comments`
-            : `Top ${{Math.min(20, toShow.length)}} Most Positive Comments`;
+            ? `Top ${{Math.min(20, candidates)}} Most Negative Comments`
+            : `Top ${{Math.min(20, candidates)}} Most Positive Comments`;
     }}
-    toShow = toShow.slice(0, 20);
+    const toShow = rows.slice(0, 20);
     toShow.forEach((row) => {{
         const newRow = tbody.insertRow();
         let reviewText = row.review;
         if (wordFilter && reviewText) {{
             /* Bold the word (case-insensitive, exact word match) */
-            const re = new RegExp(`\\b(${{wordFilter}})\\b`, 'gi');
+            const re = new RegExp(`\\\\b(${{wordFilter}})\\\\b`, 'gi');
             reviewText = reviewText.replace(re, '<b>$1</b>');
         }}
         newRow.innerHTML = `
@@ -369,11 +2028,11 @@ function updateAll(wordFilter = null, sentimentType = 'negative') {{
 }}
 
 // Word click handlers
-document.addEventListener('click', function(e) {{
+document.addEventListener('click', async function(e) {{
     if (e.target.classList.contains('word-link')) {{
         e.preventDefault();
         const word = e.target.getAttribute('data-word');
-        updateAll(word, 'negative');
+        if (!await updateAll(word, 'negative')) return;
         // Show table and title when negative word is clicked
         document.getElementById('comments-table').style.display = '';
         document.getElementById('comments-title').style.display = '';
@@ -381,7 +2040,7 @@ document.addEventListener('click', function(e) {{
     if (e.target.classList.contains('word-link-pos')) {{
         e.preventDefault();
         const word = e.target.getAttribute('data-word');
-        updateAll(word, 'positive');
+        if (!await updateAll(word, 'positive')) return;
         // Show table and title when positive word is clicked
         document.getElementById('comments-table').style.display = '';
         document.getElementById('comments-title').style.display = '';
@@ -389,7 +2048,7 @@ document.addEventListener('click', function(e) {{
 }});
 
 // Initialize page - just update data, keep table hidden
-updateAll();
+await updateAll();
 renderPlatformFilter();
     // Dual-handle slider setup (already present)
     const yearSlider = document.getElementById('yearRangeSlider');
@@ -404,13 +2063,13 @@ renderPlatformFilter();
             from: value => Math.round(value)
         }}
     }});
-    yearSlider.noUiSlider.on('update', function(values) {{
+    yearSlider.noUiSlider.on('update', async function(values) {{
         yearStart = parseInt(values[0]);
         yearEnd = parseInt(values[1]);
         document.getElementById('sliderValues').innerText = `${{yearStart}} - ${{yearEnd}}`;
         // Only update data, don't show table unless a word was previously clicked
         const currentlyVisible = document.getElementById('comments-table').style.display !== 'none';
-        updateAll();
+        if (!await updateAll()) return;
         if (!currentlyVisible) {{
             document.getElementById('comments-table').style.display = 'none';
             document.getElementById('comments-title').style.display = 'none';
@@ -425,54 +2084,582 @@ renderPlatformFilter();
 # 3. MAIN EXECUTION
 # =====================
 
-def main():
-    df = get_data()
-    # Star rating summary
-    score_counts = df['score'].value_counts().sort_index(ascending=False)
-    score_summary_html = '<table><tr><th>Stars</th><th>Count</th></tr>'
-    for star in range(5, 0, -1):
-        score_summary_html += f'<tr><td>{star}</td><td>{score_counts.get(star, 0)}</td></tr>'
-    score_summary_html += '</table>'
-    # Score vs. sentiment-type cross-tab
-    cross_tab = pd.crosstab(df['score'], df['sentiment_type'])
-    cross_tab_html = cross_tab.to_html(classes='cross-tab', border=0)
-    # Top words
+def write_summary(aggregates, stored_sentiment, path=SUMMARY_PATH, table=REVIEWS_TABLE):
+    platforms = sorted(aggregates.platforms)
+    summary = {
+        'generated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'table': table,
+        'reviews': aggregates.rows,
+        'years': [min(aggregates.years), max(aggregates.years)] if aggregates.years else None,
+        'platforms': platforms,
+        'score_counts': {star: aggregates.score_counts.get(star, 0) for star in range(5, 0, -1)},
+        'sentiment': 'stored' if stored_sentiment else 'unavailable',
+        'cross_tab': None,
+        'cube': None,
+    }
+    if stored_sentiment:
+        cross_tab = aggregates.cross_tab_frame()
+        summary['cross_tab'] = {str(score): {sentiment: int(count) for sentiment, count in row.items()}
+                                for score, row in cross_tab.iterrows()}
+        summary['cube'] = aggregates.cube(platforms)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(encode_json(summary))
+    os.replace(tmp_path, path)
+    return summary
+
+def main(incremental=False, streaming=False, chunk_size=STREAM_CHUNK_SIZE, sentiment_cache=False,
+         cache_max_entries=SENTIMENT_CACHE_MAX_ENTRIES, workers=1, engine='pattern', payload='columnar', shards=False,
+         summary_only=False, metrics_path=None, cprofile_stage=None, output_path=None, open_browser=True, phrases=False,
+         phrase_epsilon=PHRASE_EPSILON, skip_unchanged=False, table=REVIEWS_TABLE):
+    profiler = StageProfiler(enabled=metrics_path is not None, cprofile_stage=cprofile_stage)
+    written = None
     try:
-        nltk.data.find('corpora/stopwords')
-    except LookupError:
-        nltk.download('stopwords')
-    stop_words = set(nltk.corpus.stopwords.words('english'))
-    stop_words.update(['app', 'zalando', 'lounge', 'use', 'get'])
-    top_words = get_top_words(df, 'negative', stop_words)
-    top_words_html = '<table id="top-words" style="margin-bottom:24px;"><tr><th>Word</th><th>Count</th></tr>'
-    for word, count in top_words:
-        top_words_html += f'<tr><td><a href="#" class="word-link" data-word="{word}">{word}</a></td><td>{count:,}</td></tr>'
-    top_words_html += '</table>'
-    top_words_pos = get_top_words(df, 'positive', stop_words)
-    top_words_pos_html = '<table id="top-words-pos" style="margin-bottom:24px;"><tr><th>Word</th><th>Count</th></tr>'
-    for word, count in top_words_pos:
-        top_words_pos_html += f'<tr><td><a href="#" class="word-link-pos" data-word="{word}">{word}</a></td><td>{count:,}</td></tr>'
-    top_words_pos_html += '</table>'
+        if summary_only:
+            summarize(profiler, table)
+        else:
+            written = build_report(incremental, streaming, chunk_size, sentiment_cache, cache_max_entries, workers, engine,
+                                   payload, shards, profiler, output_path, open_browser, phrases, phrase_epsilon, skip_unchanged, table)
+        if metrics_path is not None:
+            profile_path = profiler.write(metrics_path, incremental=incremental, streaming=streaming, summary_only=summary_only,
+                                          engine=engine, workers=workers, payload=payload, shards=shards)
+            print(f"Stage metrics written to {metrics_path}" + (f", {cprofile_stage} profile to {profile_path}" if profile_path else ''))
+    finally:
+        profiler.close()
+    return written
+
+def listen(conn, channel):
+    # LISTEN only takes effect outside a transaction block
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f'LISTEN {channel};')
+
+def wait_for_notifications(conn, timeout):
+    # Number of notifications received within timeout seconds (None blocks until one arrives)
+    if conn.notifies:
+        received = len(conn.notifies)
+        conn.notifies.clear()
+        return received
+    readable, _, _ = select.select([conn], [], [], timeout)
+    if not readable:
+        return 0
+    conn.poll()
+    received = len(conn.notifies)
+    conn.notifies.clear()
+    return received
+
+def watch(debounce=WATCH_DEBOUNCE_SECONDS, max_wait=WATCH_MAX_WAIT_SECONDS, max_refreshes=None, **report_options):
+    # Keeps a connection LISTENing on the table's notify_channel (see migrations for the trigger) and rebuilds
+    # the report once a burst of changes has been quiet for `debounce` seconds, or `max_wait`
+    # seconds after its first notification. The report is also built at start and after every
+    # reconnect, since notifications sent while nobody listened are lost. A refresh that fails
+    # for any other reason is logged and retried on the next notification.
+    report_options = dict(report_options, open_browser=False, skip_unchanged=True)
+    channel = notify_channel(report_options.get('table', REVIEWS_TABLE))
+    conn = None
+    first_change = last_change = time.monotonic() - debounce
+    notifications = 0
+    refreshes = 0
+    while max_refreshes is None or refreshes < max_refreshes:
+        try:
+            if conn is None:
+                conn = get_connection()
+                listen(conn, channel)
+                print(f"Listening on {channel}")
+                if first_change is None:
+                    first_change = last_change = time.monotonic() - debounce
+            due = None if first_change is None else min(last_change + debounce, first_change + max_wait)
+            received = wait_for_notifications(conn, None if due is None else max(due - time.monotonic(), 0))
+            if received:
+                notifications += received
+                last_change = time.monotonic()
+                if first_change is None:
+                    first_change = last_change
+                due = min(last_change + debounce, first_change + max_wait)
+            if due is None or time.monotonic() < due:
+                continue
+            start = time.perf_counter()
+            written = main(**report_options)
+            stamp = datetime.datetime.now().isoformat(timespec='seconds')
+            outcome = 'unchanged, not rewritten' if written is False else 'written'
+            print(f"{stamp} refreshed after {notifications} notifications in {time.perf_counter() - start:.1f}s: report {outcome}")
+            first_change = None
+            notifications = 0
+            refreshes += 1
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            print(f"Lost the database connection ({e}); reconnecting in {WATCH_RETRY_SECONDS:.0f}s")
+            if conn is not None:
+                try:
+                    conn.close()
+                except psycopg2.Error:
+                    pass
+            conn = None
+            if first_change is None:
+                first_change = last_change = time.monotonic() - debounce
+            time.sleep(WATCH_RETRY_SECONDS)
+        except Exception:
+            stamp = datetime.datetime.now().isoformat(timespec='seconds')
+            print(f"{stamp} refresh after {notifications} notifications failed; still listening", file=sys.stderr)
+            traceback.print_exc()
+            first_change = None
+            notifications = 0
+            refreshes += 1
+    if conn is not None:
+        conn.close()
+
+def query_options(store, query):
+    # Parses ?start=&end=&platform=&sentiment=&word=&limit= into normalized arguments, so equal
+    # queries share cache entries; missing years mean the whole range
+    params = urllib.parse.parse_qs(query)
+    def param(name, default=None):
+        values = params.get(name)
+        return values[-1] if values and values[-1] != '' else default
+    try:
+        start = max(int(param('start', store.min_year)), store.min_year)
+        end = min(int(param('end', store.max_year)), store.max_year)
+        limit = int(param('limit', DRILLDOWN_LIMIT))
+        n = int(param('n', 10))
+    except ValueError:
+        raise ValueError('start, end, limit and n must be integers')
+    sentiment = param('sentiment', 'negative')
+    if sentiment not in ('negative', 'positive'):
+        raise ValueError(f"Unknown sentiment {sentiment!r}, expected negative or positive")
+    # Words match case-insensitively, like the page's /\bword\b/i
+    word = param('word')
+    return {'start': start, 'end': end, 'platform': store.platform_code(param('platform')), 'sentiment': sentiment,
+            'word': word.lower() if word else None, 'limit': max(0, min(limit, 1000)), 'n': max(0, min(n, 1000))}
+
+# Query server endpoints: path -> answer for (store, options)
+QUERY_ENDPOINTS = {
+    '/api/summary': lambda store, o: store.summary(o['start'], o['end'], o['platform']),
+    '/api/stars': lambda store, o: store.summary(o['start'], o['end'], o['platform'])['stars'],
+    '/api/crosstab': lambda store, o: store.summary(o['start'], o['end'], o['platform'])['cross_tab'],
+    '/api/top-words': lambda store, o: store.top_words(o['start'], o['end'], o['platform'], o['sentiment'], o['n']),
+    '/api/comments': lambda store, o: store.comments(o['start'], o['end'], o['platform'], o['sentiment'], o['word'], o['limit']),
+    '/api/view': lambda store, o: store.view(o['start'], o['end'], o['platform'], o['sentiment'], o['word']),
+}
+
+class QueryRequestHandler(http.server.BaseHTTPRequestHandler):
+    # Serves the page at / and JSON answers from server.store under /api/
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path in ('/', '/report.html'):
+            self.send_body(200, self.server.page, 'text/html; charset=utf-8')
+            return
+        endpoint = QUERY_ENDPOINTS.get(url.path)
+        if endpoint is None:
+            self.send_body(404, encode_json({'error': f'Unknown path {url.path}', 'endpoints': sorted(QUERY_ENDPOINTS)}))
+            return
+        try:
+            answer = endpoint(self.server.store, query_options(self.server.store, url.query))
+        except ValueError as e:
+            self.send_body(400, encode_json({'error': str(e)}))
+            return
+        self.send_body(200, encode_json(answer))
+
+    def send_body(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(host=SERVE_HOST, port=SERVE_PORT, incremental=False, sentiment_cache=False, cache_max_entries=SENTIMENT_CACHE_MAX_ENTRIES,
+          workers=1, engine='pattern', table=REVIEWS_TABLE, phrases=False, phrase_epsilon=PHRASE_EPSILON,
+          query_cache_size=QUERY_CACHE_SIZE):
+    # Loads and scores the reviews once, then serves a page that asks this process for each panel
+    # instead of carrying every review. The data is not refreshed while the server runs.
+    stop_words = get_stop_words()
+    cache = SentimentCache(max_entries=cache_max_entries, version=engine_version(engine)) if sentiment_cache else None
+    with scoring_pool(workers, engine) as pool:
+        df = get_data(incremental=incremental, cache=cache, scorer=make_scorer(workers, engine=engine, pool=pool), engine=engine,
+                      table=table)
+    if cache is not None:
+        print_cache_stats(cache)
+        cache.close()
+    token_counts = TokenCounts(df, stop_words)
+    phrases_html = ''
+    if phrases:
+        phrase_miner = PhraseMiner(epsilon=phrase_epsilon)
+        phrase_miner.add(token_counts)
+        phrases_html = phrase_tables_html(phrase_miner)
+    store = ReviewStore(df, token_counts, query_cache_size)
+    del df, token_counts
+    if store.min_year is None:
+        raise SystemExit(f'{table} has no dated reviews to serve')
+    html = build_html(store.min_year, store.max_year, '', '', '', '', store.platforms, None, None, None, None, phrases_html, api='api/')
+    server = http.server.ThreadingHTTPServer((host, port), QueryRequestHandler)
+    server.store = store
+    server.page = html.replace(PAYLOAD_MARKER, 'null').encode('utf-8')
+    print(f"Serving {store.rows:,} reviews at http://{host}:{server.server_port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for name, info in store.cache_stats().items():
+            print(f"Query cache {name}: {info['hits']} hits, {info['misses']} misses, {info['currsize']}/{info['maxsize']} entries")
+
+def summarize(profiler, table=REVIEWS_TABLE):
+    # Aggregates only, grouped in Postgres; no review text leaves the database
+    start = time.perf_counter()
+    with profiler.stage('summary') as stage:
+        with contextlib.closing(get_connection()) as conn:
+            aggregates, stored_sentiment = get_summary(conn, table)
+        summary = write_summary(aggregates, stored_sentiment, table=table)
+        stage['rows'] = aggregates.rows
+    print(f"Summary of {summary['reviews']:,} reviews written to {SUMMARY_PATH} "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    if not stored_sentiment:
+        print(f"{table} has no {STORED_SENTIMENT_COLUMN} column; cross-tab and sentiment cube skipped")
+    elif aggregates.unscored:
+        print(f"{aggregates.unscored:,} reviews have no stored polarity and count as neutral")
+
+def build_report(incremental, streaming, chunk_size, sentiment_cache, cache_max_entries, workers, engine, payload, shards, profiler,
+                 output_path=None, open_browser=True, phrases=False, phrase_epsilon=PHRASE_EPSILON, skip_unchanged=False,
+                 table=REVIEWS_TABLE):
+    stop_words = get_stop_words()
+    aggregates = ReportAggregates(stop_words, word_capacity=WORD_SKETCH_CAPACITY if streaming else None)
+    phrase_miner = PhraseMiner(epsilon=phrase_epsilon) if phrases else None
+    cache = SentimentCache(max_entries=cache_max_entries, version=engine_version(engine)) if sentiment_cache else None
+    spool = None
+    try:
+        # The scoring pool lives until the last review is scored
+        with scoring_pool(workers, engine) as pool:
+            scorer = make_scorer(workers, engine=engine, pool=pool)
+            if streaming:
+                # Score and aggregate one server-side chunk at a time into bounded state (word counts
+                # as sketches), spooling the scored chunks to disk; the exact word counts, drill-down
+                # index and payload are then built from the spool chunk by chunk
+                spool = ChunkSpool()
+                # The generator is closed first, so its named cursor ends before the connection, also on errors
+                with contextlib.closing(get_connection()) as conn, contextlib.closing(iter_reviews(conn, chunk_size, table)) as chunks:
+                    while True:
+                        with profiler.stage('query') as stage:
+                            chunk = next(chunks, None)
+                            stage['rows'] = 0 if chunk is None else len(chunk)
+                        if chunk is None:
+                            break
+                        with profiler.stage('sentiment') as stage:
+                            chunk = add_sentiment(chunk, cache, scorer)
+                            stage['rows'] = len(chunk)
+                        add_reviews(aggregates, chunk, profiler, phrase_miner)
+                        with profiler.stage('spool') as stage:
+                            spool.append(chunk)
+                            stage['rows'] = len(chunk)
+                        del chunk
+            else:
+                df = get_data(incremental=incremental, cache=cache, scorer=scorer, engine=engine, profiler=profiler, table=table)
+        if streaming:
+            with profiler.stage('recount') as stage:
+                aggregates.recount_words(spool)
+                stage['rows'] = aggregates.rows
+            comment_chunks = CommentChunks(spool)
+        else:
+            add_reviews(aggregates, df, profiler, phrase_miner)
+            with profiler.stage('comments') as stage:
+                comment_chunks = [get_all_comments(df)]
+                stage['rows'] = len(df)
+            del df
+        if cache is not None:
+            print_cache_stats(cache)
+            cache.close()
+        written = render_report(aggregates, comment_chunks, output_path, payload, shards, profiler, phrase_miner, skip_unchanged)
+    finally:
+        if spool is not None:
+            spool.close()
+    # Open in browser
+    if open_browser:
+        try:
+            import webbrowser
+            webbrowser.open('file://' + os.path.abspath(output_path or default_output_path()))
+        except Exception as e:
+            print(f"Error opening file in browser: {e}")
+    return written
+
+def print_cache_stats(cache):
+    stats = cache.stats()
+    print(f"Sentiment cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['evictions']} evicted, {stats['entries']}/{stats['max_entries']} entries")
+
+def default_output_path():
+    return os.path.join(os.path.dirname(__file__), 'report.html')
+
+def add_reviews(aggregates, df, profiler, phrase_miner=None):
+    # Folds a scored frame (or streaming chunk) into the aggregates: star counts, cross-tab, cube,
+    # the top-word counts and, when mining, the phrase sketches
+    with profiler.stage('aggregate') as stage:
+        token_counts = TokenCounts(df, aggregates.stop_words)
+        aggregates.add(df, token_counts)
+        stage['rows'] = len(df)
+    if phrase_miner is not None:
+        with profiler.stage('phrases') as stage:
+            phrase_miner.add(token_counts)
+            stage['rows'] = len(df)
+
+def render_report(aggregates, comment_chunks, output_path=None, payload='columnar', shards=False, profiler=None, phrase_miner=None,
+                  skip_unchanged=False):
+    # comment_chunks is re-iterable and yields the comments of the aggregated reviews in report
+    # order, as one list or one per streaming chunk; it is walked once per output it feeds
+    profiler = profiler or StageProfiler()
+    if not aggregates.years:
+        raise ValueError("No dated reviews to report on")
+    score_summary_html, cross_tab_html, top_words_html, top_words_pos_html = summary_tables_html(aggregates)
     # Years
-    all_years = sorted([y for y in df['review_date'].dt.year.unique() if y is not None])
-    min_year = min(all_years)
-    max_year = max(all_years)
+    min_year = min(aggregates.years)
+    max_year = max(aggregates.years)
     # Platforms
-    platforms = sorted(set(df['platform'].dropna().unique()))
-    # Comments for JS
-    all_comments = get_all_comments(df)
+    platforms = sorted(aggregates.platforms)
     # Build HTML
-    html = build_html(min_year, max_year, score_summary_html, cross_tab_html, top_words_html, top_words_pos_html, all_comments, platforms)
-    # Write to file
-    output_path = os.path.join(os.path.dirname(__file__), 'report.html')
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html)
-    # Open in browser
+    with profiler.stage('word_index') as stage:
+        cube = aggregates.cube(platforms)
+        top_word_tables = aggregates.top_word_tables(platforms)
+        word_index = build_word_index(comment_chunks, top_word_tables, platforms)
+        stage['rows'] = aggregates.rows
+    output_path = output_path or default_output_path()
+    manifest = None
+    shards_written = False
+    if shards:
+        # report.html keeps report_data/; other reports get their own <name>_data/ next to them
+        data_dir = os.path.splitext(output_path)[0] + '_data'
+        with profiler.stage('shards') as stage:
+            manifest, shards_written = write_shards(comment_chunks, platforms, data_dir, skip_unchanged)
+            stage['rows'] = aggregates.rows
+        print(f"Wrote {len(manifest['shards'])} review shards to {data_dir}; serve the report over HTTP "
+              f"(e.g. python -m http.server) so the page can fetch them")
+    with profiler.stage('build_html'):
+        html = build_html(min_year, max_year, score_summary_html, cross_tab_html, top_words_html, top_words_pos_html, platforms, cube,
+                          top_word_tables, word_index, manifest, phrase_tables_html(phrase_miner) if phrase_miner else '')
+    # Write to file, streaming the review payload instead of formatting it into the template
+    with profiler.stage('write') as stage:
+        written = write_report(output_path, html, [b'null'] if manifest else iter_comment_payload(comment_chunks, platforms, payload),
+                               skip_unchanged)
+        stage['rows'] = aggregates.rows
+    # A sharded page embeds only the manifest, so new reviews can change the shards alone
+    return written or shards_written
+
+def load_report_specs(path, payload=None, shards=None, phrases=None, table=None):
+    # A JSON list of {"name", "output", "table", "platforms", "payload", "shards", "phrases"}; only
+    # name is required. Outputs default to report_<name>.html and, like relative outputs, are
+    # placed next to the spec file. A spec's table, payload, shards and phrases override --table,
+    # --payload, --shards and --phrases; the arguments are those options, None when not given.
+    # A spec key meeting a given option is an error rather than a silently ignored option; keys
+    # and options both missing fall back to REVIEWS_TABLE, columnar, no shards and no phrases.
+    options = {'table': table, 'payload': payload, 'shards': shards, 'phrases': phrases}
+    with open(path, encoding='utf-8') as f:
+        entries = pyjson.load(f)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path}: expected a non-empty JSON list of report specs")
+    base_dir = os.path.dirname(os.path.abspath(path))
+    specs = []
+    names = set()
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get('name'):
+            raise ValueError(f"{path}: every report spec needs a name, got {entry!r}")
+        name = str(entry['name'])
+        unknown = sorted(set(entry) - set(REPORT_SPEC_KEYS))
+        if unknown:
+            raise ValueError(f"{path}: report {name!r} has unknown keys {', '.join(unknown)}")
+        if name in names:
+            raise ValueError(f"{path}: report name {name!r} is used twice")
+        names.add(name)
+        overridden = [key for key, value in options.items() if value is not None and key in entry]
+        if overridden:
+            raise ValueError(f"{path}: report {name!r} sets {', '.join(overridden)}, which would override "
+                             f"{', '.join('--' + key for key in overridden)}; drop the option or the spec keys")
+        if entry.get('payload', payload or 'columnar') not in PAYLOAD_FORMATS:
+            raise ValueError(f"{path}: report {name!r} has unknown payload {entry['payload']!r}")
+        platforms = entry.get('platforms')
+        if isinstance(platforms, str):
+            platforms = [platforms]
+        slug = re.sub(r'[^A-Za-z0-9_-]+', '-', name).strip('-') or 'report'
+        specs.append({
+            'name': name,
+            'output': os.path.join(base_dir, entry.get('output') or f'report_{slug}.html'),
+            'table': check_table_name(entry.get('table', table or REVIEWS_TABLE)),
+            'platforms': platforms,
+            'payload': entry.get('payload', payload or 'columnar'),
+            'shards': bool(entry.get('shards', shards)),
+            'phrases': bool(entry.get('phrases', phrases)),
+        })
+    outputs = [spec['output'] for spec in specs]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError(f"{path}: two reports write to the same output file")
+    return specs
+
+def load_table(pool, table, incremental, cache, scorer, engine):
+    start = time.perf_counter()
+    conn = pool.getconn()
+    try:
+        df = get_data(incremental=incremental, cache=cache, scorer=scorer, engine=engine, table=table, conn=conn)
+    finally:
+        pool.putconn(conn)
+    return df, time.perf_counter() - start
+
+def run_report_spec(spec, load, stop_words, phrase_epsilon=PHRASE_EPSILON, skip_unchanged=False):
+    # Renders one report from its table's shared, already scored frame; the frame is only read
+    df, load_seconds = load.result()
+    start = time.perf_counter()
+    if spec['platforms'] is not None:
+        df = df[df['platform'].isin(spec['platforms'])]
+    if not len(df):
+        raise ValueError(f"no reviews in {spec['table']}" + (f" for {', '.join(map(str, spec['platforms']))}" if spec['platforms'] else ''))
+    aggregates = ReportAggregates(stop_words)
+    phrase_miner = PhraseMiner(epsilon=phrase_epsilon) if spec['phrases'] else None
+    add_reviews(aggregates, df, StageProfiler(), phrase_miner)
+    written = render_report(aggregates, [get_all_comments(df)], spec['output'], spec['payload'], spec['shards'], None, phrase_miner,
+                            skip_unchanged)
+    return {'reviews': len(df), 'load_seconds': load_seconds, 'render_seconds': time.perf_counter() - start, 'written': written}
+
+def run_batch(spec_path, batch_workers=BATCH_WORKERS, incremental=False, sentiment_cache=False,
+              cache_max_entries=SENTIMENT_CACHE_MAX_ENTRIES, workers=1, engine='pattern', payload=None, shards=None,
+              phrases=None, phrase_epsilon=PHRASE_EPSILON, skip_unchanged=False, table=None):
+    # Builds every report in the spec file in one process. payload, shards, phrases and table
+    # apply to the specs that leave them out (see load_report_specs). Each table is queried and scored once,
+    # over a pooled connection, however many reports use it; the stop words, NLTK corpus, scorer
+    # and sentiment cache are loaded once. Loads and renders run on batch_workers threads, and a
+    # report starts as soon as its table is in. Returns one result per spec, in spec order.
+    start = time.perf_counter()
+    specs = load_report_specs(spec_path, payload, shards, phrases, table)
+    stop_words = get_stop_words()
+    cache = SentimentCache(max_entries=cache_max_entries, version=engine_version(engine)) if sentiment_cache else None
+    tables = sorted({spec['table'] for spec in specs})
+    batch_workers = max(1, batch_workers)
+    pool = psycopg2.pool.ThreadedConnectionPool(1, min(batch_workers, len(tables)), **connection_params())
+    results = []
     try:
-        import webbrowser
-        webbrowser.open('file://' + output_path)
-    except Exception as e:
-        print(f"Error opening file in browser: {e}")
+        # Tables loading at the same time share one scoring pool
+        with scoring_pool(workers, engine) as processes, ThreadPoolExecutor(max_workers=batch_workers) as executor:
+            scorer = make_scorer(workers, engine=engine, pool=processes)
+            # Loads are queued ahead of the reports, so a report blocked on its table never delays a load
+            loads = {table: executor.submit(load_table, pool, table, incremental, cache, scorer, engine) for table in tables}
+            renders = [executor.submit(run_report_spec, spec, loads[spec['table']], stop_words, phrase_epsilon, skip_unchanged)
+                       for spec in specs]
+            for spec, future in zip(specs, renders):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'error': f'{type(e).__name__}: {e}'}
+                results.append(dict(result, name=spec['name'], output=spec['output'], table=spec['table']))
+    finally:
+        pool.closeall()
+        if cache is not None:
+            print_cache_stats(cache)
+            cache.close()
+    for result in results:
+        if 'error' in result:
+            print(f"  {result['name']:<24} FAILED: {result['error']}")
+            continue
+        outcome = 'unchanged, not rewritten' if result['written'] is False else os.path.relpath(result['output'])
+        print(f"  {result['name']:<24} {result['reviews']:>10,} reviews  load {result['load_seconds']:6.1f}s (shared)  "
+              f"render {result['render_seconds']:6.1f}s  {outcome}")
+    failed = sum(1 for result in results if 'error' in result)
+    print(f"Built {len(results) - failed} of {len(results)} reports from {len(tables)} tables "
+          f"in {time.perf_counter() - start:.1f}s")
+    return results
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Generate the Zalando Lounge reviews report.')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', action='store_true',
+                      help='fetch only new or changed reviews and merge them into the local snapshot')
+    mode.add_argument('--streaming', action='store_true',
+                      help='read reviews through a server-side cursor and score them chunk by chunk')
+    parser.add_argument('--chunk-size', type=int, default=STREAM_CHUNK_SIZE,
+                        help='rows per chunk in streaming mode (default: %(default)s)')
+    parser.add_argument('--sentiment-cache', action='store_true',
+                        help='reuse polarities of reviews scored before, kept in '
+                             f'{os.path.relpath(SENTIMENT_CACHE_PATH, os.path.dirname(__file__))} next to this script')
+    # The cache used to be on by default; the old opt-out still parses
+    parser.add_argument('--no-sentiment-cache', dest='sentiment_cache', action='store_false', help=argparse.SUPPRESS)
+    parser.add_argument('--cache-max-entries', type=int, default=SENTIMENT_CACHE_MAX_ENTRIES,
+                        help='with --sentiment-cache, evict least recently used polarities beyond this many (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes used for sentiment scoring; 0 uses every core (default: %(default)s)')
+    parser.add_argument('--engine', choices=SENTIMENT_ENGINES, default='pattern',
+                        help='sentiment engine: TextBlob PatternAnalyzer or the vectorized lexicon scorer (default: %(default)s)')
+    # --payload and --table default to None so that --batch can tell whether they were given
+    parser.add_argument('--payload', choices=PAYLOAD_FORMATS, default=None,
+                        help='how review data is embedded in the page (default: columnar)')
+    parser.add_argument('--shards', action='store_true',
+                        help='write reviews to per-year and platform files in report_data/ that the page loads on demand')
+    parser.add_argument('--summary-only', action='store_true',
+                        help=f'compute the summary aggregates in Postgres and write them to {os.path.basename(SUMMARY_PATH)} '
+                             'instead of building the report')
+    parser.add_argument('--migrate', action='store_true',
+                        help='create the indexes the summary and incremental queries use, then exit')
+    parser.add_argument('--metrics', nargs='?', const=METRICS_PATH, default=None, metavar='PATH',
+                        help='record wall time, CPU time, rows and tracemalloc peak per stage and write them as JSON '
+                             f'(default path: {os.path.basename(METRICS_PATH)}); tracing makes the run slower')
+    parser.add_argument('--cprofile', choices=PROFILE_STAGES, default=None, metavar='STAGE',
+                        help=f'also dump cProfile stats for one stage ({", ".join(PROFILE_STAGES)}) next to the metrics file')
+    parser.add_argument('--output', default=None, metavar='PATH',
+                        help='where to write the report (default: report.html next to this script)')
+    parser.add_argument('--no-browser', dest='open_browser', action='store_false',
+                        help='do not open the finished report in a browser')
+    parser.add_argument('--phrases', action='store_true',
+                        help='add top bigram and trigram tables per sentiment, mined with a bounded-memory sketch')
+    parser.add_argument('--phrase-epsilon', type=float, default=PHRASE_EPSILON,
+                        help='phrase counts may be off by at most this share of each class\'s phrases (default: %(default)s)')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and rebuild the report when the --table changes (LISTEN <table>_changed, '
+                             f'e.g. {notify_channel()}; run --migrate with the same --table once to install the trigger)')
+    parser.add_argument('--debounce', type=float, default=WATCH_DEBOUNCE_SECONDS,
+                        help='with --watch, seconds without notifications before rebuilding (default: %(default)s)')
+    parser.add_argument('--max-wait', type=float, default=WATCH_MAX_WAIT_SECONDS,
+                        help='with --watch, rebuild at most this many seconds after the first notification (default: %(default)s)')
+    parser.add_argument('--table', default=None,
+                        help=f'[schema.]table to read reviews from, summarize, migrate or watch (default: {REVIEWS_TABLE})')
+    parser.add_argument('--batch', default=None, metavar='SPECS',
+                        help='build every report listed in a JSON spec file, sharing one connection pool, each table\'s '
+                             'query and scoring, the stop words and the sentiment cache if enabled')
+    parser.add_argument('--batch-workers', type=int, default=BATCH_WORKERS,
+                        help='with --batch, threads loading tables and rendering reports (default: %(default)s)')
+    parser.add_argument('--serve', action='store_true',
+                        help='instead of writing the report, serve it from a local HTTP server that answers each '
+                             'filter with a small JSON query, so the page never loads every review')
+    parser.add_argument('--host', default=SERVE_HOST, help='with --serve, address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=SERVE_PORT, help='with --serve, port to listen on (default: %(default)s)')
+    args = parser.parse_args()
+    if args.cprofile and args.metrics is None:
+        args.metrics = METRICS_PATH
+    if args.summary_only and (args.streaming or args.incremental or args.engine != parser.get_default('engine')
+                              or args.workers != parser.get_default('workers') or args.sentiment_cache or args.shards or args.phrases):
+        parser.error('--summary-only aggregates in Postgres without scoring; it cannot be combined with --streaming, '
+                     '--incremental, --engine, --workers, --sentiment-cache, --shards or --phrases')
+    if args.batch and (args.streaming or args.summary_only or args.watch or args.metrics is not None or args.output):
+        parser.error('--batch cannot be combined with --streaming, --summary-only, --watch, --metrics, --cprofile or --output; '
+                     'give each report its output in the spec file')
+    if args.serve and (args.batch or args.streaming or args.summary_only or args.watch or args.shards or args.metrics is not None):
+        parser.error('--serve cannot be combined with --batch, --streaming, --summary-only, --watch, --shards, --metrics or --cprofile')
+    table = args.table or REVIEWS_TABLE
+    payload = args.payload or 'columnar'
+    if args.migrate:
+        conn = get_connection()
+        applied = migrate(conn, table)
+        conn.close()
+        print(f'Applied {applied} migration statements to {table}')
+        raise SystemExit(0)
+    if args.batch:
+        # Options left out are passed as None, so the specs can tell them from explicit ones
+        results = run_batch(args.batch, args.batch_workers, incremental=args.incremental, sentiment_cache=args.sentiment_cache,
+                            cache_max_entries=args.cache_max_entries, workers=args.workers, engine=args.engine,
+                            payload=args.payload, shards=args.shards or None, phrases=args.phrases or None,
+                            phrase_epsilon=args.phrase_epsilon, table=args.table)
+        raise SystemExit(1 if any('error' in result for result in results) else 0)
+    options = dict(incremental=args.incremental, streaming=args.streaming, chunk_size=args.chunk_size,
+                   sentiment_cache=args.sentiment_cache, cache_max_entries=args.cache_max_entries, workers=args.workers,
+                   engine=args.engine, payload=payload, shards=args.shards, summary_only=args.summary_only,
+                   metrics_path=args.metrics, cprofile_stage=args.cprofile, output_path=args.output, open_browser=args.open_browser,
+                   phrases=args.phrases, phrase_epsilon=args.phrase_epsilon, table=table)
+    if args.serve:
+        serve(args.host, args.port, incremental=args.incremental, sentiment_cache=args.sentiment_cache,
+              cache_max_entries=args.cache_max_entries, workers=args.workers, engine=args.engine, table=table,
+              phrases=args.phrases, phrase_epsilon=args.phrase_epsilon)
+        raise SystemExit(0)
+    if args.watch:
+        watch(debounce=args.debounce, max_wait=args.max_wait, **options)
+    else:
+        main(**options)
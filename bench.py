@@ -0,0 +1,582 @@
+import os
+import io
+import argparse
+import time
+import gzip
+import datetime
+import json
+import sqlite3
+import tempfile
+import tracemalloc
+import contextlib
+import threading
+import psycopg2
+from collections import Counter
+import numpy as np
+import pandas as pd
+import backup
+
+# =====================
+# 1. INPUT DATA
+# =====================
+
+def load_texts(rows=None):
+    # Prefer the local snapshot so benchmarks do not hit Postgres
+    df = backup.load_snapshot(backup.SNAPSHOT_PATH)
+    if df is None:
+        conn = backup.get_connection()
+        df = backup.fetch_reviews(conn)
+        conn.close()
+    texts = df['translated_content'].dropna().astype(str).tolist()
+    return texts[:rows] if rows else texts
+
+def load_reviews(rows=None):
+    df = backup.load_snapshot(backup.SNAPSHOT_PATH)
+    if df is None:
+        df = backup.get_data()
+    df = df.head(rows) if rows else df
+    return backup.add_sentiment(df.copy())
+
+# Word pools for synthetic reviews; each review leans towards one tone
+SYNTHETIC_WORDS = {
+    'positive': ['great', 'good', 'love', 'perfect', 'excellent', 'fast', 'nice', 'happy', 'beautiful', 'comfortable'],
+    'neutral': ['order', 'delivery', 'shoes', 'dress', 'size', 'app', 'price', 'return', 'refund', 'package', 'quality',
+                'customer', 'service', 'shipping', 'item', 'jacket', 'the', 'and', 'was', 'it', 'my', 'very', 'not',
+                'is', 'i', 'but', 'with', 'for', 'this', 'again'],
+    'negative': ['bad', 'terrible', 'slow', 'broken', 'awful', 'poor', 'disappointed', 'worst', 'late', 'wrong'],
+}
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), '.cache', 'bench_baseline.json')
+
+def synthetic_reviews(rows, words_median=20, words_sigma=0.8, platforms=('android', 'ios'), years=(2019, 2024), seed=0):
+    # zalando_reviews-shaped rows: log-normal review lengths in words, a tone per review that
+    # biases word choice and the star score, dates uniform over the year span, and 1% of rows
+    # with empty or NULL text that the report query filters out
+    rng = np.random.default_rng(seed)
+    lengths = np.maximum(1, np.rint(rng.lognormal(np.log(words_median), words_sigma, rows))).astype(int)
+    tones = rng.choice(3, size=rows, p=[0.45, 0.2, 0.35])
+    pools = [SYNTHETIC_WORDS['positive'], SYNTHETIC_WORDS['neutral'], SYNTHETIC_WORDS['negative']]
+    vocab = np.array(pools[0] + pools[1] + pools[2], dtype=object)
+    offsets = np.cumsum([0] + [len(pool) for pool in pools])
+    word_tones = np.repeat(tones, lengths)
+    # A quarter of the words come from the review's tone pool, the rest are neutral
+    toned = rng.random(len(word_tones)) < 0.25
+    pick = np.where(toned, word_tones, 1)
+    # Zipf-like word frequencies within each pool, so common phrases stand out as in real reviews
+    ranks = np.zeros(len(pick), dtype=int)
+    for p, pool in enumerate(pools):
+        cdf = np.cumsum(1 / np.arange(1, len(pool) + 1))
+        chosen = pick == p
+        ranks[chosen] = np.searchsorted(cdf / cdf[-1], rng.random(chosen.sum()))
+    words = vocab[offsets[pick] + ranks]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    texts = [' '.join(words[bounds[i]:bounds[i + 1]]).capitalize() + '.' for i in range(rows)]
+    missing = np.flatnonzero(rng.random(rows) < 0.01)
+    for i in missing:
+        texts[i] = None if i % 2 else ''
+    scores = np.select([tones == 0, tones == 2], [rng.integers(4, 6, rows), rng.integers(1, 3, rows)], rng.integers(2, 5, rows))
+    start = pd.Timestamp(f'{years[0]}-01-01')
+    span = (pd.Timestamp(f'{years[1] + 1}-01-01') - start).total_seconds()
+    dates = start + pd.to_timedelta(np.sort(rng.random(rows) * span)[::-1], unit='s')
+    return pd.DataFrame({
+        'score': scores,
+        'translated_content': texts,
+        'review_date': dates.floor('s'),
+        'platform': rng.choice(list(platforms), size=rows),
+    }, columns=backup.REVIEW_COLUMNS)
+
+def load_sqlite(df, path):
+    # Offline stand-in for Postgres: the report query runs unchanged on SQLite through pandas
+    conn = sqlite3.connect(path)
+    conn.execute('DROP TABLE IF EXISTS zalando_reviews')
+    conn.execute('CREATE TABLE zalando_reviews (score INTEGER, translated_content TEXT, review_date TEXT, platform TEXT)')
+    rows = zip(df['score'].tolist(), df['translated_content'].tolist(),
+               df['review_date'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(), df['platform'].tolist())
+    conn.executemany('INSERT INTO zalando_reviews VALUES (?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    return lambda: sqlite3.connect(path)
+
+def load_postgres(df, dsn, replace=False):
+    # Loads into zalando_reviews of the database at dsn; refuses to touch a table that already
+    # holds rows unless replace is set, so a production DSN is never overwritten by accident
+    conn = psycopg2.connect(dsn)
+    with conn, conn.cursor() as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS zalando_reviews (
+            score INTEGER, translated_content TEXT, review_date TIMESTAMP, platform TEXT
+        )""")
+        cur.execute('SELECT EXISTS (SELECT 1 FROM zalando_reviews)')
+        if cur.fetchone()[0]:
+            if not replace:
+                raise SystemExit(f'zalando_reviews at {dsn} is not empty; pass --replace to overwrite it')
+            cur.execute('TRUNCATE zalando_reviews')
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cur.copy_expert('COPY zalando_reviews (score, translated_content, review_date, platform) FROM STDIN WITH CSV', buffer)
+    conn.close()
+    return lambda: psycopg2.connect(dsn)
+
+@contextlib.contextmanager
+def reviews_database(connect):
+    # Points the report at the benchmark database for the duration
+    original = backup.get_connection
+    backup.get_connection = connect
+    try:
+        yield
+    finally:
+        backup.get_connection = original
+
+# =====================
+# 2. BENCHMARKS
+# =====================
+
+def get_all_comments_loop(df):
+    # The original row-by-row implementation, kept as the reference for get_all_comments; test_backup.py
+    # checks that both give the same comments
+    all_comments = []
+    for row in df.itertuples(index=False):
+        content = row.translated_content
+        if content is not None and not (isinstance(content, float) and pd.isna(content)):
+            words = str(content).lower()
+        else:
+            words = ''
+        date_val = row.review_date
+        date_str = ''
+        year_val = None
+        if isinstance(date_val, (pd.Timestamp, datetime.datetime, datetime.date)):
+            if not pd.isna(date_val):
+                date_str = date_val.strftime('%Y-%m-%d')
+                year_val = date_val.year
+        elif isinstance(date_val, str):
+            try:
+                parsed = pd.to_datetime(date_val)
+                if not pd.isna(parsed):
+                    date_str = parsed.strftime('%Y-%m-%d')
+                    year_val = parsed.year
+            except Exception:
+                date_str = date_val
+                year_val = None
+        all_comments.append({
+            'score': row.score,
+            'sentiment': row.sentiment,
+            'sentiment_raw': row.sentiment_raw,
+            'sentiment_type': row.sentiment_type,
+            'review': content,
+            'date': date_str,
+            'year': year_val,
+            'words': words,
+            'platform': getattr(row, 'platform', 'unknown')
+        })
+    return all_comments
+
+def bench_comments(df, repeat=3):
+    # Speed only; see get_all_comments_loop for where equality is checked
+    print(f'{len(df):,} reviews, best of {repeat}')
+    timings = {}
+    for name, func in [('loop', get_all_comments_loop), ('columnar', backup.get_all_comments)]:
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(df)
+            seconds.append(time.perf_counter() - start)
+        timings[name] = min(seconds)
+        print(f'{name:>9} {timings[name]:>9.3f}s {len(df) / timings[name]:>12,.0f} reviews/s '
+              f'{timings["loop"] / timings[name]:>6.1f}x')
+
+def bench_scoring(texts, worker_counts, batch_size=backup.SCORING_BATCH_SIZE):
+    start = time.perf_counter()
+    serial = backup.score_texts(texts)
+    serial_seconds = time.perf_counter() - start
+    print(f'{len(texts):,} reviews, batch size {batch_size}')
+    print(f'{"workers":>8} {"seconds":>9} {"reviews/s":>11} {"speedup":>8}  matches serial')
+    print(f'{"serial":>8} {serial_seconds:>9.2f} {len(texts) / serial_seconds:>11,.0f} {1.0:>8.2f}  -')
+    for workers in worker_counts:
+        start = time.perf_counter()
+        parallel = backup.score_texts_parallel(texts, workers=workers, batch_size=batch_size)
+        seconds = time.perf_counter() - start
+        # Exact comparison: the parallel path must reproduce the serial floats bit for bit
+        matches = parallel == serial
+        print(f'{workers:>8} {seconds:>9.2f} {len(texts) / seconds:>11,.0f} {serial_seconds / seconds:>8.2f}  {matches}')
+        if not matches:
+            raise SystemExit(f'parallel scoring with {workers} workers differs from the serial path')
+
+def bench_engines(texts):
+    start = time.perf_counter()
+    pattern = backup.score_texts(texts)
+    pattern_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    lexicon = backup.LexiconScorer()(texts)
+    lexicon_seconds = time.perf_counter() - start
+    differs = sum(1 for a, b in zip(pattern, lexicon) if abs(a - b) > 1e-9)
+    type_differs = sum(1 for a, b in zip(pattern, lexicon) if backup.sentiment_type(a) != backup.sentiment_type(b))
+    max_delta = max((abs(a - b) for a, b in zip(pattern, lexicon)), default=0.0)
+    print(f'{len(texts):,} reviews')
+    print(f'pattern  {pattern_seconds:>9.2f}s {len(texts) / pattern_seconds:>11,.0f} reviews/s')
+    print(f'lexicon  {lexicon_seconds:>9.2f}s {len(texts) / lexicon_seconds:>11,.0f} reviews/s '
+          f'({pattern_seconds / lexicon_seconds:.1f}x)')
+    print(f'polarity differs:       {differs:,} ({differs / max(len(texts), 1):.2%}), max delta {max_delta:.3f}')
+    print(f'sentiment_type differs: {type_differs:,} ({type_differs / max(len(texts), 1):.2%})')
+
+def bench_payload(df):
+    all_comments = backup.get_all_comments(df)
+    platforms = sorted(set(df['platform'].dropna().unique()))
+    print(f'{len(all_comments):,} reviews')
+    print(f'{"format":>14} {"embedded":>12} {"gzip on wire":>13} {"vs rows":>8} {"encode s":>9}')
+    baseline = None
+    for payload in backup.PAYLOAD_FORMATS:
+        start = time.perf_counter()
+        text = backup.comment_payload(all_comments, platforms, payload)
+        seconds = time.perf_counter() - start
+        size = len(text.encode('utf-8'))
+        wire = len(gzip.compress(text.encode('utf-8')))
+        baseline = baseline or size
+        print(f'{payload:>14} {size:>12,} {wire:>13,} {size / baseline:>8.2f} {seconds:>9.2f}')
+
+def bench_serve(df, queries=200, seed=0):
+    # --serve's query store: build time, cold and cached latency per query kind on random filters,
+    # response size against the payload the static page embeds, and the full-range top words
+    # against ReportAggregates
+    stop_words = backup.get_stop_words()
+    start = time.perf_counter()
+    token_counts = backup.TokenCounts(df, stop_words)
+    store = backup.ReviewStore(df, token_counts)
+    build = time.perf_counter() - start
+    aggregates = backup.ReportAggregates(stop_words)
+    aggregates.add(df, token_counts)
+    for sentiment in ('negative', 'positive'):
+        expected = [[word, count] for word, count in aggregates.top_words(sentiment)]
+        if store.top_words(store.min_year, store.max_year, None, sentiment) != expected:
+            raise SystemExit(f'{sentiment} top words differ from ReportAggregates')
+    rng = np.random.default_rng(seed)
+    words = sorted({word for sentiment in ('negative', 'positive') for word, _ in aggregates.top_words(sentiment, 30)})
+    timings = {'summary': [], 'top_words': [], 'comments': [], 'word': []}
+    sizes = []
+    filters = []
+    for _ in range(queries):
+        first, last = sorted(rng.integers(store.min_year, store.max_year + 1, 2).tolist())
+        platform = None if rng.random() < 0.3 else int(rng.integers(len(store.platforms)))
+        sentiment = ('negative', 'positive')[int(rng.integers(2))]
+        filters.append((first, last, platform, sentiment, words[int(rng.integers(len(words)))]))
+    for repeat in ('cold', 'cached'):
+        for first, last, platform, sentiment, word in filters:
+            for kind, query in (('summary', lambda: store.summary(first, last, platform)),
+                                ('top_words', lambda: store.top_words(first, last, platform, sentiment)),
+                                ('comments', lambda: store.comments(first, last, platform, sentiment)),
+                                ('word', lambda: store.comments(first, last, platform, sentiment, word))):
+                start = time.perf_counter()
+                query()
+                timings[kind].append((repeat, time.perf_counter() - start))
+            if repeat == 'cold':
+                sizes.append(len(backup.encode_json(store.view(first, last, platform, sentiment, word))))
+    static = len(backup.comment_payload(backup.get_all_comments(df), store.platforms).encode('utf-8'))
+    print(f'{len(df):,} reviews, store built in {build:.2f}s, {queries} random filters ({len(set(filters))} distinct)')
+    print(f'{"query":>10} {"cold ms":>9} {"p95 ms":>8} {"cached ms":>10}')
+    for kind, runs in timings.items():
+        cold = np.array([seconds for repeat, seconds in runs if repeat == 'cold']) * 1000
+        cached = np.array([seconds for repeat, seconds in runs if repeat == 'cached']) * 1000
+        print(f'{kind:>10} {cold.mean():>9.2f} {np.percentile(cold, 95):>8.2f} {cached.mean():>10.3f}')
+    print(f'view response {np.mean(sizes):,.0f} bytes on average; the static page embeds {static:,} bytes of reviews')
+
+def exact_phrases(token_counts, sizes):
+    # Reference counts: every n-gram of adjacent kept tokens within a review, in a plain Counter
+    sentiments = token_counts.groups['sentiment_type'].to_numpy()
+    counts = {}
+    bounds = np.flatnonzero(np.diff(token_counts.doc)) + 1
+    for doc_codes, doc in zip(np.split(token_counts.codes, bounds), np.split(token_counts.doc, bounds)):
+        if not len(doc):
+            continue
+        sentiment = sentiments[doc[0]]
+        words = token_counts.vocab[doc_codes].tolist()
+        for n in sizes:
+            counter = counts.setdefault((sentiment, n), Counter())
+            counter.update(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return counts
+
+def bench_phrases(df, epsilon=backup.PHRASE_EPSILON, k=backup.PHRASE_TOP_K, batch_tokens=backup.PHRASE_BATCH_TOKENS):
+    token_counts = backup.TokenCounts(df, backup.get_stop_words())
+    miner = backup.PhraseMiner(epsilon=epsilon, batch_tokens=batch_tokens)
+    tracemalloc.start()
+    start = time.perf_counter()
+    miner.add(token_counts)
+    sketch_seconds = time.perf_counter() - start
+    sketch_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    exact = exact_phrases(token_counts, miner.sizes)
+    exact_seconds = time.perf_counter() - start
+    exact_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{len(df):,} reviews, epsilon {epsilon} ({miner.capacity:,} counters per class), top {k}')
+    print(f'sketch {sketch_seconds:>8.2f}s peak {sketch_peak / 1e6:>8.1f} MB')
+    print(f'exact  {exact_seconds:>8.2f}s peak {exact_peak / 1e6:>8.1f} MB')
+    print(f'{"class":<9} {"n":>2} {"phrases":>11} {"distinct":>10} {"bound":>8} {"max err":>8} {"recall":>7} {"in range":>9}')
+    failures = 0
+    for (sentiment, n), counter in sorted(exact.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+        sketch = miner.sketches.get((sentiment, n))
+        reported = sketch.top(k) if sketch else []
+        ranked = counter.most_common()
+        # A reported phrase is a hit when it ties or beats the exact k-th count
+        kth = ranked[min(k, len(ranked)) - 1][1] if ranked else 0
+        hits = sum(1 for phrase, _, _ in reported if counter[phrase] >= kth)
+        max_error = max((counter[phrase] - low for phrase, low, _ in reported), default=0)
+        in_range = all(low <= counter[phrase] <= high for phrase, low, high in reported)
+        bound = epsilon * sum(counter.values())
+        failures += (not in_range) or max_error > bound
+        print(f'{str(sentiment):<9} {n:>2} {sum(counter.values()):>11,} {len(counter):>10,} {bound:>8.1f} {max_error:>8,} '
+              f'{hits / max(min(k, len(ranked)), 1):>7.0%} {str(in_range):>9}')
+    if failures:
+        raise SystemExit('phrase sketch counts fall outside their error bounds')
+
+def measure(func, rows, memory=True):
+    # One timed run, then one under tracemalloc for the peak so tracing does not skew the time
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    measured = {'seconds': round(seconds, 4), 'rows_per_second': round(rows / seconds, 1) if seconds else None}
+    if memory:
+        tracemalloc.start()
+        func()
+        measured['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, measured
+
+def bench_pipeline(sizes, generator, engine='lexicon', dsn=None, replace=False, memory=True):
+    results = {}
+    for rows in sizes:
+        reviews = synthetic_reviews(rows, **generator)
+        with tempfile.TemporaryDirectory() as tmp:
+            if dsn:
+                connect = load_postgres(reviews, dsn, replace)
+            else:
+                connect = load_sqlite(reviews, os.path.join(tmp, 'reviews.sqlite'))
+            scorer = backup.make_scorer(engine=engine)
+            stop_words = backup.get_stop_words()
+            steps = {}
+            with reviews_database(connect):
+                df, steps['get_data'] = measure(lambda: backup.get_data(scorer=scorer, engine=engine), rows, memory)
+                _, steps['get_top_words'] = measure(lambda: backup.get_top_words(df, 'negative', stop_words), rows, memory)
+                all_comments, steps['get_all_comments'] = measure(lambda: backup.get_all_comments(df), rows, memory)
+                # build_html and the write, from precomputed aggregates as in main()
+                aggregates = backup.ReportAggregates(stop_words)
+                aggregates.add(df)
+                platforms = sorted(aggregates.platforms)
+                top_word_tables = aggregates.top_word_tables(platforms)
+                word_index = backup.build_word_index([all_comments], top_word_tables, platforms)
+                def render():
+                    html = backup.build_html(min(aggregates.years), max(aggregates.years), *backup.summary_tables_html(aggregates),
+                                             platforms, aggregates.cube(platforms), top_word_tables, word_index)
+                    backup.write_report(os.path.join(tmp, 'build_html.html'), html,
+                                        backup.iter_comment_payload([all_comments], platforms))
+                _, steps['build_html'] = measure(render, rows, memory)
+                _, steps['main'] = measure(lambda: backup.main(sentiment_cache=False, engine=engine, open_browser=False,
+                                                               output_path=os.path.join(tmp, 'report.html')), rows, memory)
+        results[str(rows)] = steps
+    return {
+        'generated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'context': {'engine': engine, 'database': 'postgres' if dsn else 'sqlite', 'generator': generator},
+        'sizes': results,
+    }
+
+def compare_baseline(results, baseline, tolerance):
+    # Prints each step against the baseline and returns the steps slower or larger by more than tolerance
+    regressions = []
+    print(f'{"rows":>9} {"step":<17} {"seconds":>9} {"rows/s":>12} {"peak MB":>9} {"time vs base":>13} {"mem vs base":>12}')
+    for rows, steps in results['sizes'].items():
+        for step, measured in steps.items():
+            base = (baseline or {}).get('sizes', {}).get(rows, {}).get(step)
+            line = f'{int(rows):>9,} {step:<17} {measured["seconds"]:>9.3f} {measured["rows_per_second"] or 0:>12,.0f} '
+            line += f'{measured["peak_bytes"] / 1e6:>9.1f} ' if 'peak_bytes' in measured else f'{"-":>9} '
+            for key, width in (('seconds', 13), ('peak_bytes', 12)):
+                if base and base.get(key) and key in measured:
+                    ratio = measured[key] / base[key]
+                    line += f'{ratio - 1:>+{width}.1%}'
+                    if ratio > 1 + tolerance:
+                        regressions.append(f'{rows} rows {step} {key}: {ratio - 1:+.1%}')
+                else:
+                    line += f'{"-":>{width}}'
+            print(line)
+    return regressions
+
+def bench_watch(dsn, rows, burst, debounce, replace=False):
+    # End-to-end --watch check against a scratch Postgres: the initial build, then one rebuild for
+    # a burst of single-row inserts, timed from the last insert to the new report
+    connect = load_postgres(synthetic_reviews(rows), dsn, replace)
+    conn = connect()
+    backup.migrate(conn)
+    conn.close()
+    with tempfile.TemporaryDirectory() as tmp, reviews_database(connect):
+        output_path = os.path.join(tmp, 'report.html')
+        daemon = threading.Thread(target=backup.watch, kwargs={
+            'debounce': debounce, 'max_refreshes': 2, 'output_path': output_path, 'sentiment_cache': False, 'engine': 'lexicon'})
+        daemon.start()
+        while not os.path.exists(output_path):
+            time.sleep(0.1)
+        built = os.stat(output_path).st_mtime_ns
+        new_reviews = synthetic_reviews(burst, seed=1)
+        new_reviews['review_date'] = pd.Timestamp.now().floor('s')
+        conn = connect()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for review in new_reviews.itertuples(index=False):
+                cur.execute('INSERT INTO zalando_reviews (score, translated_content, review_date, platform) VALUES (%s, %s, %s, %s)',
+                            (int(review.score), review.translated_content, review.review_date.to_pydatetime(), review.platform))
+        conn.close()
+        last_insert = time.perf_counter()
+        daemon.join()
+        latency = time.perf_counter() - last_insert
+        rebuilt = os.stat(output_path).st_mtime_ns != built
+    print(f'{rows:,} reviews, burst of {burst} inserts, debounce {debounce}s')
+    print(f'report {"rebuilt" if rebuilt else "NOT rebuilt"} {latency:.2f}s after the last insert')
+    if not rebuilt:
+        raise SystemExit('the watcher did not rebuild the report after the inserts')
+
+def bench_batch(dsn, rows, platforms, engine='pattern', batch_workers=backup.BATCH_WORKERS, replace=False):
+    # One report for all reviews plus one per platform, built by separate main() runs and then by
+    # a single --batch run over the same scratch Postgres; the batch output must be identical
+    connect = load_postgres(synthetic_reviews(rows, platforms=tuple(platforms)), dsn, replace)
+    specs = [{'name': 'all'}] + [{'name': platform, 'platforms': [platform]} for platform in platforms]
+    original_params = backup.connection_params
+    backup.connection_params = lambda: {'dsn': dsn}
+    try:
+        with tempfile.TemporaryDirectory() as tmp, reviews_database(connect):
+            start = time.perf_counter()
+            for spec in specs:
+                # A separate run sees only its platforms, as if its query filtered them
+                original_fetch = backup.fetch_reviews
+                if 'platforms' in spec:
+                    backup.fetch_reviews = lambda conn, since=None, table=backup.REVIEWS_TABLE, keep=spec['platforms']: (
+                        original_fetch(conn, since, table).query('platform in @keep').reset_index(drop=True))
+                try:
+                    backup.main(sentiment_cache=False, engine=engine, output_path=os.path.join(tmp, f"single_{spec['name']}.html"),
+                                open_browser=False)
+                finally:
+                    backup.fetch_reviews = original_fetch
+            separate = time.perf_counter() - start
+            spec_path = os.path.join(tmp, 'specs.json')
+            with open(spec_path, 'w', encoding='utf-8') as f:
+                json.dump(specs, f)
+            start = time.perf_counter()
+            results = backup.run_batch(spec_path, batch_workers, sentiment_cache=False, engine=engine)
+            batch = time.perf_counter() - start
+            mismatched = []
+            for spec in specs:
+                with open(os.path.join(tmp, f"single_{spec['name']}.html"), 'rb') as single, \
+                        open(os.path.join(tmp, f"report_{spec['name']}.html"), 'rb') as batched:
+                    if single.read() != batched.read():
+                        mismatched.append(spec['name'])
+    finally:
+        backup.connection_params = original_params
+    print(f'{rows:,} reviews, {len(specs)} reports, engine {engine}, {batch_workers} batch workers')
+    print(f'separate runs {separate:8.2f}s')
+    print(f'batch         {batch:8.2f}s  ({separate / batch:.1f}x)')
+    failed = [result['name'] for result in results if 'error' in result]
+    if failed or mismatched:
+        raise SystemExit(f'batch reports failed ({", ".join(failed) or "none"}) or differ from separate runs '
+                         f'({", ".join(mismatched) or "none"})')
+
+# =====================
+# 3. MAIN EXECUTION
+# =====================
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks for the report pipeline.')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    scoring = subparsers.add_parser('scoring', help='sentiment scoring throughput by worker count')
+    scoring.add_argument('--rows', type=int, default=None, help='limit the number of reviews scored')
+    scoring.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8, os.cpu_count() or 1])
+    scoring.add_argument('--batch-size', type=int, default=backup.SCORING_BATCH_SIZE)
+    engines = subparsers.add_parser('engines', help='lexicon engine speed and disagreement with PatternAnalyzer')
+    engines.add_argument('--rows', type=int, default=None, help='limit the number of reviews scored')
+    payload = subparsers.add_parser('payload', help='size of each review payload format')
+    payload.add_argument('--rows', type=int, default=None, help='limit the number of reviews encoded')
+    comments = subparsers.add_parser('comments', help='get_all_comments against the row-by-row loop, speed')
+    comments.add_argument('--rows', type=int, default=None, help='limit the number of reviews converted')
+    comments.add_argument('--repeat', type=int, default=3, help='timed runs per implementation; the best is reported')
+    pipeline = subparsers.add_parser('pipeline', help='get_data, get_top_words, get_all_comments, build_html and main() on synthetic reviews')
+    pipeline.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help='row counts to run')
+    pipeline.add_argument('--words-median', type=float, default=20, help='median review length in words')
+    pipeline.add_argument('--words-sigma', type=float, default=0.8, help='spread of the log-normal review length')
+    pipeline.add_argument('--platforms', nargs='+', default=['android', 'ios'])
+    pipeline.add_argument('--years', type=int, nargs=2, default=[2019, 2024], metavar=('FIRST', 'LAST'))
+    pipeline.add_argument('--seed', type=int, default=0)
+    pipeline.add_argument('--engine', choices=backup.SENTIMENT_ENGINES, default='lexicon',
+                          help='sentiment engine for get_data and main (default: %(default)s)')
+    pipeline.add_argument('--dsn', default=None,
+                          help='load into zalando_reviews of this Postgres database instead of a temporary SQLite file')
+    pipeline.add_argument('--replace', action='store_true', help='allow truncating a non-empty zalando_reviews at --dsn')
+    pipeline.add_argument('--no-memory', dest='memory', action='store_false', help='skip the tracemalloc pass for peak memory')
+    pipeline.add_argument('--baseline', default=BASELINE_PATH, help='stored results to compare against (default: %(default)s)')
+    pipeline.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    pipeline.add_argument('--tolerance', type=float, default=0.2,
+                          help='fail when a step is this much slower or larger than the baseline (default: %(default)s)')
+    phrases = subparsers.add_parser('phrases', help='sketch top-k bigrams/trigrams against exact counts')
+    phrases.add_argument('--rows', type=int, default=None, help='limit the number of reviews mined')
+    phrases.add_argument('--synthetic', type=int, default=None, metavar='ROWS',
+                         help='mine this many synthetic reviews instead of the snapshot')
+    phrases.add_argument('--epsilon', type=float, default=backup.PHRASE_EPSILON)
+    phrases.add_argument('--top', type=int, default=backup.PHRASE_TOP_K)
+    phrases.add_argument('--batch-tokens', type=int, default=backup.PHRASE_BATCH_TOKENS)
+    serve = subparsers.add_parser('serve', help='--serve query store latency and response size on random filters')
+    serve.add_argument('--rows', type=int, default=None, help='limit the number of reviews loaded')
+    serve.add_argument('--synthetic', type=int, default=None, metavar='ROWS',
+                       help='use this many synthetic reviews instead of the snapshot')
+    serve.add_argument('--queries', type=int, default=200, help='random filters to run (default: %(default)s)')
+    watch = subparsers.add_parser('watch', help='--watch rebuild latency after a burst of inserts (needs a scratch Postgres)')
+    watch.add_argument('--dsn', required=True, help='scratch database; zalando_reviews there is created and filled')
+    watch.add_argument('--rows', type=int, default=10_000, help='synthetic reviews loaded before the watcher starts')
+    watch.add_argument('--burst', type=int, default=50, help='reviews inserted one statement at a time')
+    watch.add_argument('--debounce', type=float, default=1.0)
+    watch.add_argument('--replace', action='store_true', help='allow truncating a non-empty zalando_reviews at --dsn')
+    batch = subparsers.add_parser('batch', help='--batch against one main() run per report (needs a scratch Postgres)')
+    batch.add_argument('--dsn', required=True, help='scratch database; zalando_reviews there is created and filled')
+    batch.add_argument('--rows', type=int, default=20_000, help='synthetic reviews loaded')
+    batch.add_argument('--platforms', nargs='+', default=['android', 'ios', 'web'], help='one extra report per platform')
+    batch.add_argument('--engine', choices=backup.SENTIMENT_ENGINES, default='pattern')
+    batch.add_argument('--batch-workers', type=int, default=backup.BATCH_WORKERS)
+    batch.add_argument('--replace', action='store_true', help='allow truncating a non-empty zalando_reviews at --dsn')
+    args = parser.parse_args()
+    if args.benchmark == 'scoring':
+        bench_scoring(load_texts(args.rows), args.workers, args.batch_size)
+    elif args.benchmark == 'engines':
+        bench_engines(load_texts(args.rows))
+    elif args.benchmark == 'payload':
+        bench_payload(load_reviews(args.rows))
+    elif args.benchmark == 'comments':
+        bench_comments(load_reviews(args.rows), args.repeat)
+    elif args.benchmark == 'phrases':
+        if args.synthetic:
+            df = backup.add_sentiment(synthetic_reviews(args.synthetic), scorer=backup.LexiconScorer())
+        else:
+            df = load_reviews(args.rows)
+        bench_phrases(df, args.epsilon, args.top, args.batch_tokens)
+    elif args.benchmark == 'serve':
+        if args.synthetic:
+            df = backup.add_sentiment(synthetic_reviews(args.synthetic), scorer=backup.LexiconScorer())
+            # Same rows as the report query
+            df = df[df['translated_content'].notna() & (df['translated_content'] != '')].reset_index(drop=True)
+        else:
+            df = load_reviews(args.rows)
+        bench_serve(df, args.queries)
+    elif args.benchmark == 'batch':
+        bench_batch(args.dsn, args.rows, args.platforms, args.engine, args.batch_workers, args.replace)
+    elif args.benchmark == 'watch':
+        bench_watch(args.dsn, args.rows, args.burst, args.debounce, args.replace)
+    elif args.benchmark == 'pipeline':
+        generator = {'words_median': args.words_median, 'words_sigma': args.words_sigma, 'platforms': args.platforms,
+                     'years': args.years, 'seed': args.seed}
+        results = bench_pipeline(args.sizes, generator, args.engine, args.dsn, args.replace, args.memory)
+        baseline = None
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+            if baseline.get('context') != results['context']:
+                print(f'Baseline {args.baseline} was recorded with different settings: {baseline.get("context")}')
+        regressions = compare_baseline(results, baseline, args.tolerance)
+        if args.save_baseline:
+            os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+            with open(args.baseline, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=1)
+            print(f'Baseline saved to {args.baseline}')
+        elif regressions:
+            raise SystemExit('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
@@ -0,0 +1,488 @@
+import os
+import io
+import json
+import random
+import string
+import datetime
+import tracemalloc
+from collections import Counter
+import psycopg2
+import pytest
+import numpy as np
+import pandas as pd
+import backup
+import bench
+
+# A scratch Postgres database for the SQL tests, e.g. postgresql://postgres@localhost/scratch; they are
+# skipped without it. Each test works in a schema of its own and drops it afterwards.
+TEST_DSN = os.environ.get('REVIEWS_TEST_DSN')
+needs_postgres = pytest.mark.skipif(not TEST_DSN, reason='REVIEWS_TEST_DSN is not set')
+
+# =====================
+# 1. FAKE DATABASE
+# =====================
+
+class FakeNamedCursor:
+    # Server-side cursor stand-in: every fetchmany() generates the next rows, so the test itself
+    # never holds more than one chunk. With nulls, some rows have no platform or no review date.
+    def __init__(self, rows, nulls=False):
+        self.rows = rows
+        self.nulls = nulls
+        self.fetched = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+        return False
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchmany(self, size):
+        size = min(size, self.rows - self.fetched)
+        if size <= 0:
+            return []
+        chunk = bench.synthetic_reviews(size, seed=self.fetched)
+        if self.nulls:
+            chunk['review_date'] = chunk['review_date'].astype(object)
+            chunk.loc[chunk.index % 50 == 7, 'platform'] = None
+            chunk.loc[chunk.index % 70 == 11, 'review_date'] = None
+        self.fetched += size
+        return list(chunk.itertuples(index=False, name=None))
+
+class FakeConnection:
+    def __init__(self, rows, nulls=False):
+        self.rows = rows
+        self.nulls = nulls
+        self.cursors = []
+        self.closed = False
+
+    def cursor(self, name=None):
+        self.cursors.append(FakeNamedCursor(self.rows, self.nulls))
+        return self.cursors[-1]
+
+    def close(self):
+        self.closed = True
+
+def fake_reviews(monkeypatch, rows, chunk_size, nulls=False):
+    # Streaming reads the fake cursor chunk by chunk; the in-memory path gets the same chunks at once
+    monkeypatch.setattr(backup, 'get_connection', lambda: FakeConnection(rows, nulls))
+    monkeypatch.setattr(backup, 'fetch_reviews', lambda conn, since=None, table=backup.REVIEWS_TABLE: fetch_all(conn, chunk_size))
+
+def fetch_all(conn, chunk_size=1000):
+    cursor = conn.cursor()
+    records = []
+    while True:
+        chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            break
+        records.extend(chunk)
+    frame = pd.DataFrame.from_records(records, columns=backup.REVIEW_COLUMNS)
+    frame['review_date'] = pd.to_datetime(frame['review_date'])
+    return frame
+
+def build(path, streaming, chunk_size=1000, payload='columnar', shards=False, skip_unchanged=False):
+    return backup.build_report(False, streaming, chunk_size, False, backup.SENTIMENT_CACHE_MAX_ENTRIES, 1, 'lexicon', payload, shards,
+                               backup.StageProfiler(), output_path=str(path), open_browser=False, skip_unchanged=skip_unchanged)
+
+def report_files(directory):
+    return {os.path.relpath(os.path.join(root, name), directory): open(os.path.join(root, name), 'rb').read()
+            for root, _, names in os.walk(directory) for name in names}
+
+# =====================
+# 2. COMMENTS
+# =====================
+
+def odd_reviews():
+    # The values get_all_comments has to pass through unchanged or special-case
+    scored = {
+        'score': [5, 1, 3, 4, 2, 5, 1, 4],
+        'translated_content': ['Great APP', np.nan, None, 'İstanbul ẞ delivery', '', 'Bad', 'ok', pd.NA],
+        'sentiment_raw': [0.8, 0.0, 0.0, 0.2, 0.0, -0.7, 0.5, 0.0],
+    }
+    frames = {
+        'datetime column with NaT': pd.DataFrame({**scored, 'platform': ['ios', 'android', None, 'ios', 'android', np.nan, 'ios', 'ios'],
+                                                  'review_date': pd.to_datetime(['2023-01-02', None, '2021-12-31', '2024-02-29',
+                                                                                 '2022-06-01', '2020-01-01', '2023-01-02', '2019-07-04'])}),
+        'string dates': pd.DataFrame({**scored, 'platform': ['ios'] * 8,
+                                      'review_date': ['2023-01-02', '02/03/2021', 'not a date', '', None, '2023-01-02T10:00:00+02:00',
+                                                      'NaT', '2023-01-02']}),
+        'mixed object dates': pd.DataFrame({**scored, 'platform': ['android'] * 8,
+                                            'review_date': pd.Series([datetime.date(2022, 3, 4), pd.Timestamp('2021-05-06'), pd.NaT, np.nan,
+                                                                      datetime.datetime(2020, 1, 1, 12), '2019-09-09', 20230101, 'x'], dtype=object)}),
+        'missing platform column': pd.DataFrame({**scored, 'review_date': pd.to_datetime(['2023-01-02'] * 8)}),
+    }
+    return {name: backup.add_sentiment(frame) for name, frame in frames.items()}
+
+def assert_same_comments(expected, actual, label=''):
+    # Same keys in the same order, same types, equal values; NaN matches NaN
+    assert len(actual) == len(expected), label
+    for i, (row, new) in enumerate(zip(expected, actual)):
+        assert list(new) == list(row), (label, i)
+        for key in row:
+            assert type(new[key]) is type(row[key]), (label, i, key, row[key], new[key])
+            assert row[key] is new[key] or row[key] == new[key] or (isinstance(row[key], float) and pd.isna(new[key])), \
+                (label, i, key, row[key], new[key])
+
+def test_get_all_comments_matches_row_loop_on_odd_values():
+    for name, frame in odd_reviews().items():
+        assert_same_comments(bench.get_all_comments_loop(frame), backup.get_all_comments(frame), name)
+
+def test_get_all_comments_matches_row_loop():
+    df = backup.add_sentiment(bench.synthetic_reviews(2000, seed=4), scorer=backup.LexiconScorer())
+    assert_same_comments(bench.get_all_comments_loop(df), backup.get_all_comments(df))
+
+# =====================
+# 3. STREAMING
+# =====================
+
+def test_streaming_matches_in_memory(tmp_path, monkeypatch):
+    fake_reviews(monkeypatch, 5000, 700)
+    for payload, shards in [('rows', False), ('columnar', False), ('columnar-gzip', False), ('columnar', True)]:
+        memory = tmp_path / payload / str(shards) / 'memory'
+        streaming = tmp_path / payload / str(shards) / 'streaming'
+        memory.mkdir(parents=True)
+        streaming.mkdir(parents=True)
+        build(memory / 'report.html', streaming=False, payload=payload, shards=shards)
+        build(streaming / 'report.html', streaming=True, chunk_size=700, payload=payload, shards=shards)
+        assert report_files(streaming) == report_files(memory), payload
+
+def test_reviews_without_platform_or_date_are_reported(tmp_path, monkeypatch):
+    fake_reviews(monkeypatch, 3000, 700, nulls=True)
+    (tmp_path / 'memory').mkdir()
+    (tmp_path / 'streaming').mkdir()
+    build(tmp_path / 'memory' / 'report.html', streaming=False, shards=True)
+    build(tmp_path / 'streaming' / 'report.html', streaming=True, chunk_size=700, shards=True)
+    assert report_files(tmp_path / 'streaming') == report_files(tmp_path / 'memory')
+    # Such reviews count towards the overall word tables but towards no (year, platform) slice
+    df = backup.add_sentiment(fetch_all(FakeConnection(3000, nulls=True)), scorer=backup.LexiconScorer())
+    aggregates = backup.ReportAggregates(backup.get_stop_words())
+    aggregates.add(df)
+    dated = df[df['platform'].notna() & df['review_date'].notna()]
+    for sentiment in ('negative', 'positive'):
+        sliced = Counter()
+        for key, counts in aggregates.slice_word_counts.items():
+            if key[2] == sentiment:
+                sliced.update(counts)
+        token_counts = backup.TokenCounts(dated, backup.get_stop_words())
+        assert sliced == token_counts.total(token_counts.groups['sentiment_type'] == sentiment)
+        assert sum(aggregates.word_counts[sentiment].values()) > sum(sliced.values())
+
+def test_streaming_closes_the_connection_on_errors(tmp_path, monkeypatch):
+    connections = []
+    def get_connection():
+        connections.append(FakeConnection(5000))
+        return connections[-1]
+    monkeypatch.setattr(backup, 'get_connection', get_connection)
+    scored = backup.add_sentiment
+    def add_sentiment(df, *args, **kwargs):
+        if connections[0].cursors[0].fetched > 1000:
+            raise RuntimeError('scoring failed')
+        return scored(df, *args, **kwargs)
+    monkeypatch.setattr(backup, 'add_sentiment', add_sentiment)
+    with pytest.raises(RuntimeError, match='scoring failed'):
+        build(tmp_path / 'report.html', streaming=True)
+    assert connections[0].cursors[0].closed and connections[0].closed
+
+def streaming_peak(path):
+    tracemalloc.start()
+    try:
+        build(path, streaming=True)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def test_streaming_memory_is_flat(tmp_path, monkeypatch):
+    # Twice the rows through the same chunk size may not raise the traced peak by more than noise
+    fake_reviews(monkeypatch, 2000, 1000)
+    streaming_peak(tmp_path / 'warmup.html')
+    fake_reviews(monkeypatch, 8000, 1000)
+    single = streaming_peak(tmp_path / 'single.html')
+    fake_reviews(monkeypatch, 16000, 1000)
+    double = streaming_peak(tmp_path / 'double.html')
+    assert double < single * 1.2, (single, double)
+
+def test_sketched_word_counts_recount_exactly():
+    stop_words = backup.get_stop_words()
+    chunks = [backup.add_sentiment(bench.synthetic_reviews(1000, seed=seed), scorer=backup.LexiconScorer()) for seed in range(5)]
+    exact = backup.ReportAggregates(stop_words)
+    sketched = backup.ReportAggregates(stop_words, word_capacity=20)
+    for chunk in chunks:
+        exact.add(chunk)
+        sketched.add(chunk)
+    sketched.recount_words(chunks)
+    for sentiment in ('negative', 'positive'):
+        assert sketched.top_words(sentiment, 5) == exact.top_words(sentiment, 5)
+    platforms = sorted(exact.platforms)
+    assert sketched.top_word_tables(platforms, n=3) == exact.top_word_tables(platforms, n=3)
+
+def test_streaming_starts_one_scoring_pool(tmp_path, monkeypatch):
+    started = []
+    class CountingPool(backup.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            started.append(kwargs.get('max_workers'))
+            super().__init__(*args, **kwargs)
+    monkeypatch.setattr(backup, 'ProcessPoolExecutor', CountingPool)
+    fake_reviews(monkeypatch, 7500, 2500)
+    backup.build_report(False, True, 2500, False, backup.SENTIMENT_CACHE_MAX_ENTRIES, 2, 'pattern', 'columnar', False,
+                        backup.StageProfiler(), output_path=str(tmp_path / 'report.html'), open_browser=False)
+    assert started == [2]
+
+# =====================
+# 4. TOP WORDS
+# =====================
+
+def page_top_words(table, start, end, platform, n=backup.TOP_WORDS):
+    # topWordsInSelection() from the page
+    counts = {}
+    first_seen = {}
+    for year, plat, words, word_counts, firsts in table['slices']:
+        if start <= year <= end and (platform is None or plat == platform):
+            for word, count, first in zip(words, word_counts, firsts):
+                counts[word] = counts.get(word, 0) + count
+                first_seen[word] = min(first_seen.get(word, first), first)
+    ranked = sorted(counts, key=lambda word: (-counts[word], first_seen[word]))[:n]
+    return [[table['words'][word], counts[word]] for word in ranked]
+
+def scored_reviews(texts, years, platforms, sentiment_raw):
+    # add_sentiment only formats and classifies polarities that are already there
+    return backup.add_sentiment(pd.DataFrame({
+        'score': [1] * len(texts),
+        'translated_content': texts,
+        'review_date': pd.to_datetime([f'{year}-06-01' for year in years]),
+        'platform': platforms,
+        'sentiment_raw': sentiment_raw,
+    }))
+
+def assert_page_matches_store(df):
+    aggregates = backup.ReportAggregates(set())
+    aggregates.add(df)
+    platforms = sorted(aggregates.platforms)
+    tables = aggregates.top_word_tables(platforms)
+    store = backup.ReviewStore(df, backup.TokenCounts(df, set()))
+    years = sorted(aggregates.years)
+    for start in range(years[0], years[-1] + 1):
+        for end in range(start, years[-1] + 1):
+            for platform in [None] + list(range(len(platforms))):
+                for sentiment in ('negative', 'positive'):
+                    assert page_top_words(tables[sentiment], start, end, platform) == \
+                        store.top_words(start, end, platform, sentiment), (start, end, platform, sentiment)
+
+def test_top_words_merge_a_word_outside_every_slice_top():
+    # 'common' is only 25th in each of the four slices but first once two are merged
+    rng = random.Random(0)
+    reviews = []
+    for year in (2021, 2022):
+        for platform in ('android', 'ios'):
+            local = [f'{platform}{year}'.translate(str.maketrans('0123456789', 'abcdefghij')) + letter for letter in string.ascii_lowercase[:24]]
+            for word in local:
+                reviews += [(word, year, platform)] * 10
+            reviews += [('common', year, platform)] * 9
+    rng.shuffle(reviews)
+    texts, years, platforms = zip(*reviews)
+    assert_page_matches_store(scored_reviews(list(texts), years, platforms, [-0.5] * len(texts)))
+
+def query_server_reviews():
+    df = bench.synthetic_reviews(3000, platforms=('android', 'ios', 'web'), years=(2020, 2023), seed=3)
+    df = df[df['translated_content'].notna() & (df['translated_content'] != '')].reset_index(drop=True)
+    return backup.add_sentiment(df, scorer=backup.LexiconScorer())
+
+# Neutral reviews must not trip pandas deprecations that later majors turn into errors
+@pytest.mark.filterwarnings('error')
+def test_top_words_match_the_query_server():
+    assert_page_matches_store(query_server_reviews())
+
+def test_query_server_words_ignore_case():
+    df = query_server_reviews()
+    store = backup.ReviewStore(df, backup.TokenCounts(df, set()))
+    word = store.top_words(store.min_year, store.max_year, None, 'negative', 1)[0][0]
+    upper, lower = (backup.query_options(store, f'word={w}&sentiment=negative') for w in (word.upper(), word))
+    assert upper == lower
+    comments = backup.QUERY_ENDPOINTS['/api/comments'](store, upper)
+    assert comments and comments == backup.QUERY_ENDPOINTS['/api/comments'](store, lower)
+
+# =====================
+# 5. POSTGRES
+# =====================
+
+@pytest.fixture
+def scratch_schema():
+    # A new schema first on the search path, so the unqualified zalando_reviews resolves there
+    conn = psycopg2.connect(TEST_DSN)
+    schema = f'reviews_test_{os.getpid()}'
+    with conn, conn.cursor() as cur:
+        cur.execute(f'CREATE SCHEMA {schema}')
+        cur.execute(f'SET search_path TO {schema}')
+    try:
+        yield conn, schema
+    finally:
+        conn.rollback()
+        with conn, conn.cursor() as cur:
+            cur.execute(f'DROP SCHEMA {schema} CASCADE')
+        conn.close()
+
+def load_reviews_table(conn, df, table='zalando_reviews', sentiment=False):
+    columns = backup.REVIEW_COLUMNS + (['sentiment_raw'] if sentiment else [])
+    with conn, conn.cursor() as cur:
+        cur.execute(f'DROP TABLE IF EXISTS {table}')
+        cur.execute(f"""
+        CREATE TABLE {table} (
+            score INTEGER, translated_content TEXT, review_date TIMESTAMP, platform TEXT{', sentiment_raw DOUBLE PRECISION' if sentiment else ''}
+        )""")
+        buffer = io.StringIO()
+        df[columns].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH CSV", buffer)
+
+def summary_reviews():
+    df = bench.synthetic_reviews(3000, platforms=('android', 'ios'), seed=5)
+    df = backup.add_sentiment(df, scorer=backup.LexiconScorer())
+    df.loc[::89, 'sentiment_raw'] = np.nan
+    return backup.add_sentiment(df)
+
+@needs_postgres
+def test_summary_sql_matches_pandas(scratch_schema, tmp_path):
+    conn, _ = scratch_schema
+    df = summary_reviews()
+    expected = backup.ReportAggregates(set())
+    summarized = df[df['translated_content'].notna() & (df['translated_content'] != '')]
+    expected.add(summarized)
+    expected_unscored = summarized['sentiment_raw'].isna().sum()
+    load_reviews_table(conn, df)
+    backup.migrate(conn)
+    aggregates, stored_sentiment = backup.get_summary(conn)
+    assert not stored_sentiment
+    assert (aggregates.rows, aggregates.unscored) == (expected.rows, expected.rows)
+    assert aggregates.score_counts == expected.score_counts
+    assert (aggregates.years, aggregates.platforms) == (expected.years, expected.platforms)
+    assert not aggregates.cross_tab and not aggregates.cube_counts
+    load_reviews_table(conn, df, sentiment=True)
+    aggregates, stored_sentiment = backup.get_summary(conn)
+    assert stored_sentiment
+    assert aggregates.unscored == expected_unscored
+    assert aggregates.cross_tab == expected.cross_tab
+    assert aggregates.cube_counts == expected.cube_counts
+    assert aggregates.cube_sums == pytest.approx(dict(expected.cube_sums))
+    summary = backup.write_summary(aggregates, stored_sentiment, str(tmp_path / 'summary.json'))
+    assert json.loads((tmp_path / 'summary.json').read_text())['cross_tab'] == summary['cross_tab']
+
+@needs_postgres
+def test_stored_sentiment_is_looked_up_in_the_queried_table(scratch_schema):
+    conn, schema = scratch_schema
+    load_reviews_table(conn, summary_reviews().head(10))
+    with conn, conn.cursor() as cur:
+        cur.execute(f'CREATE SCHEMA {schema}_other')
+        cur.execute(f'CREATE TABLE {schema}_other.zalando_reviews (translated_content TEXT, sentiment_raw DOUBLE PRECISION)')
+    try:
+        assert not backup.has_stored_sentiment(conn)
+        assert backup.has_stored_sentiment(conn, f'{schema}_other.zalando_reviews')
+    finally:
+        with conn, conn.cursor() as cur:
+            cur.execute(f'DROP SCHEMA {schema}_other CASCADE')
+
+@needs_postgres
+@pytest.mark.parametrize('table', [backup.REVIEWS_TABLE, '{schema}.store_reviews', '{schema}.StoreReviews'])
+def test_migrations_are_idempotent_and_notify(scratch_schema, table):
+    conn, schema = scratch_schema
+    table = table.format(schema=schema)
+    load_reviews_table(conn, summary_reviews().head(10), table)
+    backup.migrate(conn, table)
+    assert backup.migrate(conn, table) == len(backup.migrations(table))
+    before, _ = backup.get_summary(conn, table)
+    conn.rollback()
+    backup.listen(conn, backup.notify_channel(table))
+    with conn, conn.cursor() as cur:
+        cur.execute(f"INSERT INTO {table} VALUES (5, 'Lovely', now(), 'ios')")
+    conn.poll()
+    assert [notify.channel for notify in conn.notifies] == [backup.notify_channel(table)]
+    aggregates, _ = backup.get_summary(conn, table)
+    assert aggregates.rows == before.rows + 1
+
+# =====================
+# 6. WATCH
+# =====================
+
+def test_unchanged_shards_are_not_rewritten(tmp_path, monkeypatch):
+    fake_reviews(monkeypatch, 3000, 1000)
+    path = tmp_path / 'report.html'
+    assert build(path, False, shards=True, skip_unchanged=True)
+    data_dir = tmp_path / 'report_data'
+    stamps = {name: os.stat(data_dir / name).st_mtime_ns for name in os.listdir(data_dir)}
+    assert not build(path, False, shards=True, skip_unchanged=True)
+    assert {name: os.stat(data_dir / name).st_mtime_ns for name in os.listdir(data_dir)} == stamps
+    os.remove(data_dir / sorted(stamps)[0])
+    assert build(path, False, shards=True, skip_unchanged=True)
+
+def test_watch_keeps_listening_after_a_failed_refresh(monkeypatch):
+    outcomes = [RuntimeError('no dated reviews'), True]
+    def fake_main(**options):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    monkeypatch.setattr(backup, 'get_connection', lambda: FakeConnection(0))
+    monkeypatch.setattr(backup, 'listen', lambda conn, channel: None)
+    monkeypatch.setattr(backup, 'wait_for_notifications', lambda conn, timeout: 1)
+    monkeypatch.setattr(backup, 'main', fake_main)
+    backup.watch(debounce=0, max_wait=0, max_refreshes=2)
+    assert outcomes == []
+
+# =====================
+# 7. BATCH
+# =====================
+
+def write_specs(tmp_path, specs):
+    path = tmp_path / 'specs.json'
+    path.write_text(json.dumps(specs))
+    return str(path)
+
+def test_report_specs_fill_in_options_they_leave_out(tmp_path):
+    path = write_specs(tmp_path, [{'name': 'all'}, {'name': 'ios', 'table': 'app.ios_reviews', 'payload': 'rows', 'shards': True}])
+    specs = backup.load_report_specs(path)
+    assert [(spec['table'], spec['payload'], spec['shards'], spec['phrases']) for spec in specs] == [
+        (backup.REVIEWS_TABLE, 'columnar', False, False), ('app.ios_reviews', 'rows', True, False)]
+    specs = backup.load_report_specs(path, phrases=True)
+    assert [spec['phrases'] for spec in specs] == [True, True]
+
+@pytest.mark.parametrize('option, value', [('table', 'other_reviews'), ('payload', 'columnar'), ('shards', True)])
+def test_report_specs_reject_options_they_override(tmp_path, option, value):
+    path = write_specs(tmp_path, [{'name': 'all'}, {'name': 'ios', 'table': 'app.ios_reviews', 'payload': 'rows', 'shards': True}])
+    with pytest.raises(ValueError, match=f"'ios' sets .*--{option}"):
+        backup.load_report_specs(path, **{option: value})
+
+# =====================
+# 8. INCREMENTAL
+# =====================
+
+def review_set(df):
+    return sorted(zip(df['row_key'], df['score'], df['sentiment_raw'].round(9)))
+
+@needs_postgres
+def test_second_incremental_run_matches_a_full_run(scratch_schema, tmp_path):
+    conn, _ = scratch_schema
+    reviews = bench.synthetic_reviews(400, years=(2023, 2024), seed=8)[backup.REVIEW_COLUMNS]
+    reviews.loc[[5, 50, 300], 'review_date'] = pd.NaT
+    load_reviews_table(conn, reviews)
+    snapshot_path = str(tmp_path / 'snapshot.parquet')
+    def run(incremental):
+        df = backup.get_data(incremental, snapshot_path, scorer=backup.LexiconScorer(), engine='lexicon', conn=conn)
+        conn.rollback()
+        return df
+    run(True)
+    # A new review, an edited recent one, a new undated one and an edited undated one
+    with conn, conn.cursor() as cur:
+        cur.execute("UPDATE zalando_reviews SET translated_content = 'Terrible, slow and broken.' "
+                    "WHERE review_date = (SELECT max(review_date) FROM zalando_reviews)")
+        cur.execute("UPDATE zalando_reviews SET translated_content = 'Lovely fast delivery.' "
+                    "WHERE translated_content = %(text)s", {'text': reviews.loc[50, 'translated_content']})
+        cur.execute("INSERT INTO zalando_reviews VALUES (5, 'Great fit, love it.', "
+                    "(SELECT max(review_date) + interval '1 hour' FROM zalando_reviews), 'ios'), (1, 'Awful quality.', NULL, 'android')")
+    incremental = run(True)
+    full = run(False)
+    full['row_key'] = backup.row_keys(full)
+    assert len(incremental) == len(full)
+    assert incremental['review_date'].isna().sum() == 4
+    assert review_set(incremental) == review_set(full)